@@ -0,0 +1,412 @@
+# api.py
+import argparse
+import asyncio
+import functools
+import hmac
+import json
+import math
+import os
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import urlsplit, parse_qs
+
+from catalogo import RUTA_CATALOGO, RUTA_EXCEL, cargar_catalogo, compactar_catalogo, construir_indice_tiers, buscar_precio
+from cotizaciones import guardar_cotizacion, obtener_detalle_cotizacion
+from database import TAMANO_POOL, conectar_db, inicializar_db
+from metricas import exportar_prometheus, tramo
+from motor_precios import cotizar
+
+# Límites de cada petición
+MAX_CUERPO = 1024 * 1024
+MAX_LINEAS = 500
+# Segundos que una conexión keep-alive puede quedar sin enviar otra petición
+ESPERA_INACTIVA = 30
+# Hilos para cotizar (pandas) y codificar las respuestas fuera del ciclo de eventos
+HILOS_CPU = 2
+# Trabajos que pueden esperar en la cola por cada hilo de un ejecutor
+COLA_POR_HILO = 4
+ESTADOS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+DESCUENTOS = ("item_disc", "channel_disc", "deal_reg_disc", "descuento_directo")
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+def _valor_json(valor):
+    # Escalares de numpy/pandas a tipos de Python; NaN (columnas vacías en SQLite) a null
+    if hasattr(valor, "item"):
+        valor = valor.item()
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return valor
+
+
+def _json(contenido):
+    return json.dumps(contenido, ensure_ascii=False, default=_valor_json).encode("utf-8")
+
+
+def _registros(df):
+    return [{col: _valor_json(v) for col, v in fila.items()} for fila in df.to_dict("records")]
+
+
+def _numero(datos, campo, tipo=float, minimo=None, maximo=None, defecto=0, requerido=False):
+    valor = datos.get(campo)
+    if valor is None or valor == "":
+        if requerido:
+            raise ErrorHTTP(400, f"Falta '{campo}'")
+        return defecto
+    if isinstance(valor, bool):
+        raise ErrorHTTP(400, f"'{campo}' debe ser numérico")
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        raise ErrorHTTP(400, f"'{campo}' debe ser numérico") from None
+    # Con NaN cualquier comparación es falsa: pasaría la revisión de rango
+    if not math.isfinite(numero):
+        raise ErrorHTTP(400, f"'{campo}' debe ser un número finito")
+    if tipo is int:
+        # 12 y "12.0" son el mismo término; 1.5 no se trunca en silencio a 1
+        if not numero.is_integer():
+            raise ErrorHTTP(400, f"'{campo}' debe ser entero")
+        numero = int(numero)
+    if (minimo is not None and numero < minimo) or (maximo is not None and numero > maximo):
+        raise ErrorHTTP(400, f"'{campo}' fuera de rango ({minimo} a {maximo})")
+    return numero
+
+
+class ServicioCotizador:
+    """
+    Servicio HTTP del cotizador sobre asyncio. El catálogo se carga una vez y todas las peticiones
+    lo comparten (sólo lectura). Las consultas a SQLite y el cálculo de cotizaciones (pandas y la
+    codificación JSON del resultado) corren en ThreadPoolExecutor acotados para no bloquear el
+    ciclo de eventos.
+
+    El token identifica a un solo usuario de servicio (`usuario_id`): las cotizaciones guardadas por
+    la API quedan a su nombre, nunca al del usuario que diga el cuerpo de la petición.
+    """
+
+    def __init__(self, ruta_excel=RUTA_EXCEL, ruta_catalogo=RUTA_CATALOGO, hilos_db=TAMANO_POOL, token=None,
+                 hilos_cpu=HILOS_CPU, usuario_id=None):
+        catalogo = compactar_catalogo(cargar_catalogo(ruta_excel, ruta_catalogo))
+        self.indice = construir_indice_tiers(catalogo)
+        productos_por_termino = {}
+        for termino, producto in self.indice:
+            productos_por_termino.setdefault(int(termino), []).append(producto)
+        self.productos_por_termino = {t: tuple(p) for t, p in sorted(productos_por_termino.items())}
+        self.token = token
+        self.usuario_id = usuario_id
+        self._db = ThreadPoolExecutor(max_workers=hilos_db, thread_name_prefix="api-db")
+        # Con la cola llena las peticiones esperan aquí en lugar de acumular trabajos sin límite
+        self._cupo_db = asyncio.Semaphore(hilos_db * COLA_POR_HILO)
+        self._cpu = ThreadPoolExecutor(max_workers=hilos_cpu, thread_name_prefix="api-cpu")
+        self._cupo_cpu = asyncio.Semaphore(hilos_cpu * COLA_POR_HILO)
+        self._rutas = {
+            ("GET", "salud"): self.salud,
+            ("GET", "catalogo"): self.catalogo,
+            ("GET", "precio"): self.precio,
+            ("POST", "cotizar"): self.cotizar,
+            ("POST", "cotizaciones"): self.guardar,
+            ("GET", "cotizaciones"): self.detalle,
+            ("GET", "metrics"): self.metricas,
+        }
+
+    def cerrar(self):
+        self._db.shutdown(wait=True)
+        self._cpu.shutdown(wait=True)
+
+    async def _en_db(self, funcion, *args):
+        async with self._cupo_db:
+            return await asyncio.get_running_loop().run_in_executor(self._db, functools.partial(funcion, *args))
+
+    async def _en_cpu(self, funcion, *args):
+        async with self._cupo_cpu:
+            return await asyncio.get_running_loop().run_in_executor(self._cpu, functools.partial(funcion, *args))
+
+    # ---------- Rutas ----------
+
+    async def salud(self, consulta, cuerpo):
+        return 200, {"estado": "ok"}
+
+    async def catalogo(self, consulta, cuerpo):
+        if "termino" in consulta:
+            termino = _numero(consulta, "termino", int, requerido=True)
+            if termino not in self.productos_por_termino:
+                raise ErrorHTTP(404, f"No hay productos a {termino} meses")
+            return 200, {"termino": termino, "productos": self.productos_por_termino[termino]}
+        return 200, {"terminos": list(self.productos_por_termino), "productos": self.productos_por_termino}
+
+    async def precio(self, consulta, cuerpo):
+        termino = _numero(consulta, "termino", int, requerido=True)
+        cantidad = _numero(consulta, "cantidad", int, minimo=1, defecto=1)
+        producto = consulta.get("producto")
+        if not producto:
+            raise ErrorHTTP(400, "Falta 'producto'")
+        precio = buscar_precio(self.indice, termino, producto, cantidad)
+        if precio is None:
+            raise ErrorHTTP(404, f"No hay precio para '{producto}' a {termino} meses con cantidad {cantidad}")
+        return 200, {"termino": termino, "producto": producto, "cantidad": cantidad, "precio": float(precio)}
+
+    def _cotizar(self, datos):
+        """Precios del catálogo y descuentos de las líneas de `datos`; regresa (resultado de cotizar, sin precio)."""
+        termino = _numero(datos, "termino", int, requerido=True)
+        lineas = datos.get("lineas")
+        if not isinstance(lineas, list) or not lineas:
+            raise ErrorHTTP(400, "'lineas' debe ser una lista no vacía")
+        if len(lineas) > MAX_LINEAS:
+            raise ErrorHTTP(413, f"Máximo {MAX_LINEAS} líneas por cotización")
+        con_precio = []
+        sin_precio = []
+        for linea in lineas:
+            if not isinstance(linea, dict) or not linea.get("producto"):
+                raise ErrorHTTP(400, "Cada línea necesita 'producto'")
+            cantidad = _numero(linea, "cantidad", int, minimo=1, defecto=1)
+            # Se validan también las líneas sin precio: un descuento inválido es un error aunque no se use
+            descuentos = {campo: _numero(linea, campo, minimo=0, maximo=100) for campo in DESCUENTOS}
+            precio_base = buscar_precio(self.indice, termino, linea["producto"], cantidad)
+            if precio_base is None:
+                sin_precio.append({"producto": linea["producto"], "cantidad": cantidad})
+                continue
+            con_precio.append({
+                "producto": linea["producto"], "cantidad": cantidad, "precio_base": precio_base, **descuentos,
+            })
+        if not con_precio:
+            return None, sin_precio
+        return cotizar(con_precio), sin_precio
+
+    @staticmethod
+    def _resumen(resultado, sin_precio, **extra):
+        """Resumen de la cotización ya codificado como JSON (bytes), listo para la respuesta."""
+        if resultado is None:
+            resumen = {"costo": [], "venta": [], "costo_total": 0, "venta_total": 0,
+                       "utilidad": None, "margen": None, "sin_precio": sin_precio}
+        else:
+            resumen = {
+                "costo": _registros(resultado["costo"]),
+                "venta": _registros(resultado["venta"]),
+                **{campo: _valor_json(resultado[campo]) for campo in ("costo_total", "venta_total", "utilidad", "margen")},
+                "sin_precio": sin_precio,
+            }
+        return _json({**extra, **resumen})
+
+    def _cotizar_json(self, datos):
+        return self._resumen(*self._cotizar(datos))
+
+    async def cotizar(self, consulta, cuerpo):
+        return 200, await self._en_cpu(self._cotizar_json, cuerpo)
+
+    async def guardar(self, consulta, cuerpo):
+        for campo in ("cliente", "propuesta", "responsable"):
+            if not str(cuerpo.get(campo) or "").strip():
+                raise ErrorHTTP(400, f"Falta '{campo}'")
+        if cuerpo.get("usuario_id") not in (None, self.usuario_id):
+            raise ErrorHTTP(403, f"Este token sólo guarda cotizaciones del usuario {self.usuario_id}")
+        resultado, sin_precio = await self._en_cpu(self._cotizar, cuerpo)
+        # Misma regla que el botón de guardar de la app
+        if resultado is None or not (resultado["venta_total"] > 0 and resultado["costo_total"] > 0):
+            raise ErrorHTTP(400, "La cotización no tiene venta y costo positivos")
+        datos = {
+            "cliente": cuerpo["cliente"],
+            "contacto": cuerpo.get("contacto", ""),
+            "propuesta": cuerpo["propuesta"],
+            "fecha": str(cuerpo.get("fecha") or date.today().strftime("%Y-%m-%d")),
+            "responsable": cuerpo["responsable"],
+            "total_venta": float(resultado["venta_total"]),
+            "total_costo": float(resultado["costo_total"]),
+            "utilidad": _valor_json(resultado["utilidad"]),
+            "margen": _valor_json(resultado["margen"]),
+            "vigencia": cuerpo.get("vigencia", ""),
+            "condiciones_comerciales": cuerpo.get("condiciones_comerciales", ""),
+            "usuario_id": self.usuario_id,
+        }
+        cotizacion_id = await self._en_db(
+            guardar_cotizacion, datos, resultado["venta"].to_dict("records"), resultado["costo"].to_dict("records")
+        )
+        return 201, await self._en_cpu(functools.partial(self._resumen, resultado, sin_precio, id=cotizacion_id))
+
+    async def detalle(self, consulta, cuerpo, cotizacion_id=None):
+        if cotizacion_id is None:
+            raise ErrorHTTP(405, "Usa GET /cotizaciones/<id>")
+        try:
+            datos, venta, costo = await self._en_db(obtener_detalle_cotizacion, int(cotizacion_id))
+        except ValueError:
+            raise ErrorHTTP(400, "El id de la cotización debe ser numérico") from None
+        except IndexError:
+            raise ErrorHTTP(404, f"No existe la cotización {cotizacion_id}") from None
+        return 200, {
+            "cotizacion": {col: _valor_json(v) for col, v in datos.items()},
+            "venta": _registros(venta),
+            "costo": _registros(costo),
+        }
+
+    async def metricas(self, consulta, cuerpo):
+        return 200, exportar_prometheus()
+
+    # ---------- HTTP ----------
+
+    def _autorizado(self, encabezados):
+        if not self.token:
+            return True
+        return hmac.compare_digest(encabezados.get("authorization", ""), f"Bearer {self.token}")
+
+    async def despachar(self, metodo, destino, encabezados, cuerpo):
+        """
+        Regresa (estado, contenido) de una petición; el contenido es un dict (JSON), bytes con el
+        JSON ya codificado o texto.
+        """
+        url = urlsplit(destino)
+        partes = [p for p in url.path.split("/") if p]
+        nombre, argumentos = (partes[0], partes[1:]) if partes else ("", [])
+        manejador = self._rutas.get((metodo, nombre))
+        try:
+            # Sólo GET /cotizaciones/<id> lleva un parámetro en la ruta
+            if len(argumentos) > ((metodo, nombre) == ("GET", "cotizaciones")):
+                raise ErrorHTTP(404, f"No existe {url.path}")
+            if manejador is None:
+                if any(ruta == nombre for _, ruta in self._rutas):
+                    raise ErrorHTTP(405, f"{metodo} no se permite en /{nombre}")
+                raise ErrorHTTP(404, f"No existe {url.path}")
+            if nombre != "salud" and not self._autorizado(encabezados):
+                raise ErrorHTTP(401, "Falta el token (Authorization: Bearer ...)")
+            consulta = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if metodo == "POST":
+                try:
+                    cuerpo = json.loads(cuerpo or b"{}")
+                except ValueError:
+                    raise ErrorHTTP(400, "El cuerpo no es JSON válido") from None
+                if not isinstance(cuerpo, dict):
+                    raise ErrorHTTP(400, "El cuerpo debe ser un objeto JSON")
+            with tramo(f"api_{nombre}"):
+                return await manejador(consulta, cuerpo, *argumentos)
+        except ErrorHTTP as e:
+            return e.estado, {"error": e.mensaje}
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            return 500, {"error": "Error interno"}
+
+    @staticmethod
+    def _respuesta(estado, contenido, mantener):
+        if isinstance(contenido, str):
+            cuerpo = contenido.encode("utf-8")
+            tipo = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            cuerpo = contenido if isinstance(contenido, bytes) else _json(contenido)
+            tipo = "application/json; charset=utf-8"
+        encabezado = (
+            f"HTTP/1.1 {estado} {ESTADOS.get(estado, '')}\r\n"
+            f"Content-Type: {tipo}\r\nContent-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n"
+        )
+        return encabezado.encode("latin-1") + cuerpo
+
+    async def atender(self, reader, writer):
+        """Atiende una conexión; con keep-alive (HTTP/1.1) procesa varias peticiones seguidas."""
+        try:
+            while True:
+                try:
+                    bloque = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), ESPERA_INACTIVA)
+                except asyncio.LimitOverrunError:
+                    writer.write(self._respuesta(431, {"error": "Encabezados demasiado grandes"}, False))
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                linea, *lineas = bloque.decode("latin-1").rstrip("\r\n").split("\r\n")
+                try:
+                    metodo, destino, version = linea.split(" ")
+                except ValueError:
+                    writer.write(self._respuesta(400, {"error": "Petición mal formada"}, False))
+                    break
+                encabezados = {}
+                for renglon in lineas:
+                    nombre, _, valor = renglon.partition(":")
+                    encabezados[nombre.strip().lower()] = valor.strip()
+                conexion = encabezados.get("connection", "").lower()
+                mantener = conexion == "keep-alive" if version == "HTTP/1.0" else conexion != "close"
+
+                try:
+                    largo = int(encabezados.get("content-length") or 0)
+                except ValueError:
+                    largo = -1
+                if not 0 <= largo <= MAX_CUERPO:
+                    writer.write(self._respuesta(413, {"error": f"Cuerpo de más de {MAX_CUERPO} bytes"}, False))
+                    break
+                cuerpo = await reader.readexactly(largo) if largo else b""
+
+                estado, contenido = await self.despachar(metodo.upper(), destino, encabezados, cuerpo)
+                writer.write(self._respuesta(estado, contenido, mantener))
+                await writer.drain()
+                if not mantener:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+def _validar_usuario(usuario_id):
+    conn = conectar_db()
+    try:
+        existe = conn.execute("SELECT 1 FROM usuarios WHERE id = ?", (usuario_id,)).fetchone()
+    finally:
+        conn.close()
+    if not existe:
+        raise ValueError(f"No existe el usuario {usuario_id} para guardar las cotizaciones de la API")
+
+
+async def servir(host="127.0.0.1", puerto=8502, hilos_db=TAMANO_POOL, token=None, listo=None, hilos_cpu=HILOS_CPU,
+                 usuario_id=None):
+    """
+    Inicia el servicio y atiende hasta que se cancele. `listo(puerto)` se llama al empezar a escuchar.
+    Las cotizaciones guardadas quedan a nombre de `usuario_id` (sin usuario si es None).
+    """
+    inicializar_db()
+    if usuario_id is not None:
+        _validar_usuario(usuario_id)
+    servicio = ServicioCotizador(hilos_db=hilos_db, token=token, hilos_cpu=hilos_cpu, usuario_id=usuario_id)
+    servidor = await asyncio.start_server(servicio.atender, host, puerto, backlog=1024)
+    try:
+        async with servidor:
+            if listo:
+                listo(servidor.sockets[0].getsockname()[1])
+            await servidor.serve_forever()
+    finally:
+        servicio.cerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="API HTTP del cotizador: catálogo, precios, cotización de canastas y guardado/consulta de cotizaciones."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8502)
+    parser.add_argument("--hilos-db", type=int, default=TAMANO_POOL, help="Hilos para las consultas a SQLite")
+    parser.add_argument("--hilos-cpu", type=int, default=HILOS_CPU, help="Hilos para cotizar y codificar respuestas")
+    parser.add_argument("--usuario-id", type=int,
+                        default=int(os.environ["CRM_API_USUARIO_ID"]) if os.environ.get("CRM_API_USUARIO_ID") else None,
+                        help="Usuario a cuyo nombre se guardan las cotizaciones (o CRM_API_USUARIO_ID)")
+    args = parser.parse_args()
+
+    # Con CRM_API_TOKEN definido todas las rutas salvo /salud piden Authorization: Bearer <token>
+    token = os.environ.get("CRM_API_TOKEN")
+    try:
+        asyncio.run(servir(args.host, args.puerto, args.hilos_db, token,
+                           listo=lambda p: print(f"✅ API escuchando en http://{args.host}:{p}", file=sys.stderr),
+                           hilos_cpu=args.hilos_cpu, usuario_id=args.usuario_id))
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        raise SystemExit(1)
@@ -27,6 +27,26 @@ def crear_usuario(nombre, correo, contrasena, tipo_usuario, admin_id):
     conn.commit()
     conn.close()
 
+def acceso_admin(st):
+    """
+    Formulario de acceso de las páginas de administración (métricas, resumen de ventas).
+    Regresa True si la sesión ya entró con un usuario admin o superadmin del CRM.
+    """
+    if st.session_state.get("admin_id"):
+        return True
+    with st.form("acceso_admin"):
+        st.info("🔒 Sólo administradores")
+        correo = st.text_input("Correo")
+        contrasena = st.text_input("Contraseña", type="password")
+        if not st.form_submit_button("Entrar"):
+            return False
+    usuario = autenticar_usuario(correo, contrasena)
+    if usuario is None or usuario[2] not in ("admin", "superadmin"):
+        st.error("❌ Usuario sin permisos para ver esta sección")
+        return False
+    st.session_state["admin_id"] = usuario[0]
+    st.rerun()
+
 def actualizar_contrasena(correo, nueva_contrasena):
     conn = conectar_db()
     cursor = conn.cursor()
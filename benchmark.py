@@ -0,0 +1,323 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+
+from fpdf import FPDF
+
+import database
+from catalogo import compactar_catalogo, construir_indice_tiers, buscar_precio
+from cotizaciones import (
+    guardar_cotizacion, ver_historial, ver_historial_paginado, obtener_detalle_cotizacion,
+    invalidar_detalle_cotizacion, limpiar_cache_detalles,
+)
+from datos_sinteticos import ESCALAS, catalogo_sintetico, cotizaciones_sinteticas, poblar_crm
+from documentos import anexar_documentacion
+from metricas import rss_proceso, rss_pico
+from motor_precios import cotizar
+from pdf_utils import CotizacionPDFConLogo
+
+# Cambia si cambian los nombres o el significado de los campos del JSON
+VERSION_FORMATO = 1
+# Una regresión se marca cuando ops/s cae más de esto respecto al resultado anterior
+TOLERANCIA = 0.10
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+def medir(nombre, funcion, argumentos=tuple, repeticiones=100, lote=1, calentamiento=3):
+    """
+    Corre `funcion(*argumentos())` `repeticiones` veces y regresa sus estadísticas. `argumentos()` se
+    llama fuera del tiempo medido (para preparar entradas o vaciar cachés). Con `lote` > 1 cada llamada
+    cuenta como `lote` operaciones y las latencias son por operación.
+    """
+    for _ in range(calentamiento):
+        funcion(*argumentos())
+    tiempos = []
+    for _ in range(repeticiones):
+        args = argumentos()
+        inicio = time.perf_counter_ns()
+        funcion(*args)
+        tiempos.append((time.perf_counter_ns() - inicio) / lote)
+    tiempos.sort()
+    total = sum(tiempos)
+    rss, pico = rss_proceso(), rss_pico()
+    return {
+        "nombre": nombre,
+        "operaciones": repeticiones * lote,
+        "ops_s": round(1e9 / (total / repeticiones), 2) if total else None,
+        "p50_ms": round(_percentil(tiempos, 0.50) / 1e6, 6),
+        "p99_ms": round(_percentil(tiempos, 0.99) / 1e6, 6),
+        "media_ms": round(total / repeticiones / 1e6, 6),
+        "rss_mb": round(rss / 2**20, 1) if rss else None,
+        "pico_rss_mb": round(pico / 2**20, 1) if pico else None,
+    }
+
+
+def preparar_base(escala, semilla, ruta=None, regenerar=False):
+    """
+    Deja en uso una base sintética de la escala pedida; la genera (con su catálogo y semilla) si no existe.
+    Las bases se reutilizan entre corridas para que generar 1M de cotizaciones no cuente en cada una.
+    Regresa (ruta, segundos que tomó generarla o None si ya existía).
+    """
+    ruta = ruta or os.path.join(tempfile.gettempdir(), f"benchmark_{escala}_s{semilla}.sqlite")
+    if regenerar:
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(ruta + sufijo):
+                os.remove(ruta + sufijo)
+    segundos = None
+    if not os.path.exists(ruta):
+        # Se genera con otro nombre y se renombra al final: una generación interrumpida no queda como válida
+        temporal = ruta + ".generando"
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(temporal + sufijo):
+                os.remove(temporal + sufijo)
+        database.usar_base(temporal)
+        resultado = poblar_crm(
+            ESCALAS[escala], catalogo_sintetico(semilla=semilla), semilla,
+            progreso=lambda n: print(f"\rGenerando base: {n:,} cotizaciones", end="", file=sys.stderr, flush=True),
+        )
+        print(file=sys.stderr)
+        conn = database.conectar_db()
+        conn.execute("ANALYZE")
+        conn.close()
+        # Al cerrar la última conexión SQLite vacía el WAL al archivo principal
+        database.cerrar_pool()
+        os.replace(temporal, ruta)
+        segundos = round(resultado["segundos"], 1)
+    database.usar_base(ruta)
+    database.inicializar_db()
+    return ruta, segundos
+
+
+def _usuarios(tipo):
+    conn = database.conectar_db()
+    try:
+        return [
+            {"id": id_, "tipo": tipo}
+            for (id_,) in conn.execute("SELECT id FROM usuarios WHERE tipo_usuario = ? ORDER BY id", (tipo,))
+        ]
+    finally:
+        conn.close()
+
+
+def _rango_ids():
+    conn = database.conectar_db()
+    try:
+        return conn.execute("SELECT MIN(id), MAX(id) FROM cotizaciones").fetchone()
+    finally:
+        conn.close()
+
+
+def _borrar_desde(cotizacion_id):
+    # Deja la base como estaba antes del benchmark de guardado (los triggers ajustan resumen_ventas)
+    conn = database.conectar_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM detalle_productos WHERE cotizacion_id > ?", (cotizacion_id,))
+        conn.execute("DELETE FROM cotizaciones WHERE id > ?", (cotizacion_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    limpiar_cache_detalles()
+
+
+def _carpeta_anexos(carpeta, productos, paginas=3):
+    # Dos documentos por producto, como las fichas técnicas de documentos_productos/
+    for producto in productos:
+        os.makedirs(os.path.join(carpeta, producto), exist_ok=True)
+        for numero in (1, 2):
+            pdf = FPDF()
+            pdf.set_font("Helvetica", size=11)
+            for pagina in range(paginas):
+                pdf.add_page()
+                pdf.multi_cell(0, 6, f"{producto} - documento {numero}, página {pagina + 1}\n" + "Texto de la ficha. " * 200)
+            pdf.output(os.path.join(carpeta, producto, f"ficha_{numero}.pdf"))
+
+
+def correr(escala="1k", semilla=0, ruta_db=None, regenerar=False, factor=1.0, solo=None):
+    """Corre todos los benchmarks (o los que contienen alguno de los textos de `solo`) y regresa el reporte."""
+    ruta_db, generacion = preparar_base(escala, semilla, ruta_db, regenerar)
+    rng = random.Random(semilla)
+    catalogo = catalogo_sintetico(semilla=semilla)
+    indice = construir_indice_tiers(compactar_catalogo(catalogo))
+    claves = list(indice)
+    vendedores = _usuarios("vendedor")
+    admins = _usuarios("admin")
+    id_min, id_max = _rango_ids()
+
+    def veces(n):
+        return max(int(n * factor), 1)
+
+    # Búsquedas de precio: clave existente con cantidad al azar (algunas fuera de todos los tiers)
+    busquedas = [(*rng.choice(claves), rng.randint(1, 1200)) for _ in range(1000)]
+
+    def buscar_lote():
+        for termino, producto, cantidad in busquedas:
+            buscar_precio(indice, termino, producto, cantidad)
+
+    # Canasta de 10 líneas para el motor de descuentos
+    canasta = {"producto": [], "cantidad": [], "precio_base": [], "item_disc": [], "channel_disc": [],
+               "deal_reg_disc": [], "descuento_directo": []}
+    for termino, producto, cantidad in busquedas[:10]:
+        canasta["producto"].append(producto)
+        canasta["cantidad"].append(cantidad)
+        canasta["precio_base"].append(buscar_precio(indice, termino, producto, cantidad) or 0.0)
+        canasta["item_disc"].append(rng.choice((0, 5, 10)))
+        canasta["channel_disc"].append(rng.choice((0, 5)))
+        canasta["deal_reg_disc"].append(rng.choice((0, 5)))
+        canasta["descuento_directo"].append(rng.choice((0, 10, 15)))
+
+    # Cotizaciones nuevas para guardar, distintas de las de la base (otra semilla)
+    nuevas = iter(list(cotizaciones_sinteticas(
+        veces(200) + 3, catalogo, semilla + 1, usuarios=[v["id"] for v in vendedores]
+    )))
+
+    def id_al_azar():
+        cotizacion_id = rng.randint(id_min, id_max)
+        invalidar_detalle_cotizacion(cotizacion_id)
+        return (cotizacion_id,)
+
+    # PDF de una cotización de 15 partidas
+    datos_pdf, venta_pdf, _ = next(cotizaciones_sinteticas(1, catalogo, semilla, max_partidas=1))
+    datos_pdf["id"] = 0
+    productos_pdf = [
+        {"producto": f"Producto {i}", "cantidad": p["Cantidad"], "precio_unitario": p["Precio Unitario de Lista"],
+         "precio_total": p["Precio Total con Descuento"], "descuento_aplicado": p["Descuento %"]}
+        for i, p in enumerate(venta_pdf * 15)
+    ]
+    carpeta_anexos = tempfile.mkdtemp(prefix="benchmark_anexos_")
+    try:
+        _carpeta_anexos(carpeta_anexos, [p["producto"] for p in productos_pdf[:5]])
+        principal = CotizacionPDFConLogo().generar_pdf_bytes(datos_pdf, productos_pdf, datos_pdf["total_venta"])
+
+        casos = [
+            ("buscar_precio", lambda: medir("buscar_precio", buscar_lote, repeticiones=veces(200),
+                                            lote=len(busquedas))),
+            ("cotizar", lambda: medir("cotizar (10 líneas)", cotizar, lambda: (canasta,), veces(300))),
+            ("guardar_cotizacion", lambda: _medir_guardado(nuevas, veces(200))),
+            ("ver_historial", lambda: medir("ver_historial (vendedor)", ver_historial,
+                                            lambda: (rng.choice(vendedores),), veces(20))),
+            ("ver_historial", lambda: medir("ver_historial (admin)", ver_historial,
+                                            lambda: (rng.choice(admins),), veces(5), calentamiento=1)),
+            ("ver_historial_paginado", lambda: medir("ver_historial_paginado (primera página)", ver_historial_paginado,
+                                                     repeticiones=veces(200))),
+            ("ver_historial_paginado", lambda: medir("ver_historial_paginado (vendedor, último año)",
+                                                     lambda u: ver_historial_paginado(u, fecha_desde="2024-01-01"),
+                                                     lambda: (rng.choice(vendedores),), veces(200))),
+            ("obtener_detalle_cotizacion", lambda: medir("obtener_detalle_cotizacion (sin caché)",
+                                                         obtener_detalle_cotizacion, id_al_azar, veces(500))),
+            ("generar_pdf_bytes", lambda: medir("generar_pdf_bytes (15 partidas)",
+                                                lambda: CotizacionPDFConLogo().generar_pdf_bytes(
+                                                    datos_pdf, productos_pdf, datos_pdf["total_venta"]),
+                                                repeticiones=veces(50))),
+            ("anexar_documentacion", lambda: medir("anexar_documentacion (10 anexos)",
+                                                   lambda: anexar_documentacion(BytesIO(principal), productos_pdf,
+                                                                                carpeta_anexos, salida=BytesIO()),
+                                                   repeticiones=veces(50))),
+        ]
+
+        resultados = []
+        for clave, caso in casos:
+            if solo and not any(texto in clave for texto in solo):
+                continue
+            resultado = caso()
+            print(f"{resultado['nombre']:<48} {resultado['ops_s']:>12,.1f} ops/s  p50 {resultado['p50_ms']:>10.4f} ms  "
+                  f"p99 {resultado['p99_ms']:>10.4f} ms", file=sys.stderr)
+            resultados.append(resultado)
+    finally:
+        shutil.rmtree(carpeta_anexos, ignore_errors=True)
+
+    pico = rss_pico()
+    return {
+        "version_formato": VERSION_FORMATO,
+        "commit": _commit(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "escala": escala,
+        "semilla": semilla,
+        "cotizaciones": id_max - id_min + 1 if id_max else 0,
+        "base": ruta_db,
+        "generacion_s": generacion,
+        "pico_rss_mb": round(pico / 2**20, 1) if pico else None,
+        "resultados": resultados,
+    }
+
+
+def _medir_guardado(nuevas, repeticiones):
+    ultimo_id = _rango_ids()[1] or 0
+    try:
+        return medir("guardar_cotizacion", guardar_cotizacion, lambda: next(nuevas), repeticiones)
+    finally:
+        _borrar_desde(ultimo_id)
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(anterior, actual, tolerancia=TOLERANCIA):
+    """Líneas de texto con el cambio de ops/s y p99 de cada benchmark presente en ambos reportes."""
+    previos = {r["nombre"]: r for r in anterior["resultados"]}
+    lineas = [f"{anterior.get('commit')} → {actual.get('commit')} ({actual['escala']}, semilla {actual['semilla']})"]
+    if (anterior["escala"], anterior["semilla"]) != (actual["escala"], actual["semilla"]):
+        lineas.append("⚠️ Los reportes usan escala o semilla distintas; la comparación no es directa")
+    for r in actual["resultados"]:
+        previo = previos.get(r["nombre"])
+        if not previo or not previo["ops_s"] or not r["ops_s"]:
+            continue
+        cambio = r["ops_s"] / previo["ops_s"] - 1
+        marca = "🔴" if cambio < -tolerancia else "🟢" if cambio > tolerancia else "  "
+        lineas.append(f"{marca} {r['nombre']:<48} ops/s {cambio:+7.1%}  p99 {previo['p99_ms']:.3f} → {r['p99_ms']:.3f} ms")
+    return lineas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mide las rutas críticas del cotizador sobre una base sintética y escribe el resultado en JSON."
+    )
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="1k", help="Cotizaciones en la base sintética")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--db", help="Ruta de la base sintética (por omisión en el directorio temporal)")
+    parser.add_argument("--regenerar", action="store_true", help="Vuelve a generar la base aunque exista")
+    parser.add_argument("--factor", type=float, default=1.0, help="Multiplica las repeticiones de cada benchmark")
+    parser.add_argument("--solo", nargs="+", help="Sólo los benchmarks cuyo nombre contiene alguno de estos textos")
+    parser.add_argument("--salida", help="Archivo .json del reporte (por omisión stdout)")
+    parser.add_argument("--comparar", help="Reporte .json anterior contra el cual comparar")
+    args = parser.parse_args()
+
+    reporte = correr(args.escala, args.semilla, args.db, args.regenerar, args.factor, args.solo)
+    texto = json.dumps(reporte, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        print("\n".join(comparar(anterior, reporte)), file=sys.stderr)
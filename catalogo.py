@@ -0,0 +1,168 @@
+# catalogo.py
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from metricas import instrumentar
+
+RUTA_EXCEL = "precios_threatdown.xlsx"
+RUTA_CATALOGO = "precios_threatdown.catalogo.npz"
+VERSION_FORMATO = 1
+
+# Columnas que usa el cotizador; las descripciones largas del Excel no se compilan
+COLUMNAS_TEXTO = ["Product Number", "SKU Code", "Product Title"]
+COLUMNAS_NUMERICAS = ["Term (Month)", "Tier Min", "Tier Max", "MSRP USD"]
+
+
+def _hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _firma_excel(ruta):
+    info = os.stat(ruta)
+    return {"mtime_ns": info.st_mtime_ns, "tamano": info.st_size}
+
+
+def leer_excel(ruta_excel=RUTA_EXCEL):
+    df = pd.read_excel(ruta_excel)
+    df["Tier Min"] = pd.to_numeric(df["Tier Min"], errors="coerce")
+    df["Tier Max"] = pd.to_numeric(df["Tier Max"], errors="coerce")
+    return df.dropna(subset=["Tier Min", "Tier Max"])
+
+
+def compilar_catalogo(ruta_excel=RUTA_EXCEL, ruta_catalogo=RUTA_CATALOGO):
+    """
+    Convierte la lista de precios en un archivo .npz sin comprimir (un arreglo por columna),
+    junto con la firma del Excel de origen para saber cuándo hay que recompilar.
+    """
+    df = leer_excel(ruta_excel)
+    arreglos = {}
+    for col in COLUMNAS_TEXTO:
+        arreglos[col] = df[col].fillna("").astype(str).to_numpy(dtype=str)
+    for col in COLUMNAS_NUMERICAS:
+        arreglos[col] = df[col].to_numpy(dtype=np.float64 if col != "Term (Month)" else np.int64)
+
+    meta = dict(_firma_excel(ruta_excel), sha256=_hash_archivo(ruta_excel),
+                version=VERSION_FORMATO, filas=len(df))
+    arreglos["_meta"] = np.array(json.dumps(meta))
+
+    # Escritura atómica para no dejar un catálogo a medias si otro proceso lo está leyendo
+    temporal = f"{ruta_catalogo}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as f:
+        np.savez(f, **arreglos)
+    os.replace(temporal, ruta_catalogo)
+    return meta
+
+
+def _leer_compilado(ruta_catalogo):
+    with np.load(ruta_catalogo, allow_pickle=False) as datos:
+        meta = json.loads(str(datos["_meta"]))
+        columnas = {col: datos[col] for col in COLUMNAS_TEXTO + COLUMNAS_NUMERICAS}
+    return meta, columnas
+
+
+def _esta_vigente(meta, ruta_excel):
+    if meta.get("version") != VERSION_FORMATO:
+        return False
+    if not os.path.exists(ruta_excel):
+        # Sin Excel (p. ej. imagen de despliegue) el catálogo compilado es la única fuente
+        return True
+    firma = _firma_excel(ruta_excel)
+    if firma["mtime_ns"] == meta["mtime_ns"] and firma["tamano"] == meta["tamano"]:
+        return True
+    # El mtime cambia con un checkout o una copia; sólo se recompila si cambió el contenido
+    return firma["tamano"] == meta["tamano"] and _hash_archivo(ruta_excel) == meta["sha256"]
+
+
+@instrumentar("cargar_catalogo")
+def cargar_catalogo(ruta_excel=RUTA_EXCEL, ruta_catalogo=RUTA_CATALOGO):
+    columnas = None
+    if os.path.exists(ruta_catalogo):
+        try:
+            meta, columnas = _leer_compilado(ruta_catalogo)
+            if not _esta_vigente(meta, ruta_excel):
+                columnas = None
+        except (OSError, ValueError, KeyError):
+            columnas = None
+
+    if columnas is None:
+        compilar_catalogo(ruta_excel, ruta_catalogo)
+        meta, columnas = _leer_compilado(ruta_catalogo)
+
+    return pd.DataFrame({col: columnas[col] for col in COLUMNAS_TEXTO + COLUMNAS_NUMERICAS})
+
+
+def compactar_catalogo(df):
+    """
+    Copia compacta e inmutable del catálogo para compartirla entre sesiones: los textos como
+    categorías y los números en arreglos de sólo lectura (quien necesite modificarlo debe copiarlo).
+    """
+    columnas = {}
+    for col in df.columns:
+        if col in COLUMNAS_TEXTO:
+            columnas[col] = pd.Categorical(df[col].fillna(""))
+        else:
+            arreglo = np.array(df[col].to_numpy(), copy=True)
+            if col in ("Term (Month)", "Tier Min", "Tier Max") and np.all(arreglo == np.floor(arreglo)):
+                arreglo = arreglo.astype(np.int32)
+            arreglo.flags.writeable = False
+            columnas[col] = arreglo
+    return pd.DataFrame(columnas, copy=False)
+
+
+def construir_indice_tiers(df):
+    """
+    Índice {(plazo, producto): (tier_min, tier_max, precio)} con los tiers ordenados por Tier Min
+    en tuplas (el índice se comparte entre sesiones y no debe modificarse),
+    para resolver el precio de una cantidad con bisect en lugar de filtrar el DataFrame.
+    Los productos conservan el orden en que aparecen en el catálogo.
+    """
+    indice = {}
+    for clave, grupo in df.groupby(["Term (Month)", "Product Title"], sort=False):
+        grupo = grupo.sort_values("Tier Min", kind="stable")
+        indice[clave] = (
+            tuple(grupo["Tier Min"].tolist()),
+            tuple(grupo["Tier Max"].tolist()),
+            tuple(grupo["MSRP USD"].tolist()),
+        )
+    return indice
+
+
+def buscar_precio(indice, termino, producto, cantidad):
+    tiers = indice.get((termino, producto))
+    if tiers is None:
+        return None
+    minimos, maximos, precios = tiers
+    i = bisect.bisect_right(minimos, cantidad) - 1
+    if i >= 0 and cantidad <= maximos[i]:
+        return precios[i]
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compila precios_threatdown.xlsx a un catálogo binario.")
+    parser.add_argument("--excel", default=RUTA_EXCEL)
+    parser.add_argument("--salida", default=RUTA_CATALOGO)
+    parser.add_argument("--si-cambio", action="store_true",
+                        help="Sólo recompila si el Excel cambió desde la última compilación")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.si_cambio and os.path.exists(args.salida):
+        meta, _ = _leer_compilado(args.salida)
+        if _esta_vigente(meta, args.excel):
+            print(f"✅ {args.salida} ya está al día ({meta['filas']} filas)")
+            raise SystemExit(0)
+    meta = compilar_catalogo(args.excel, args.salida)
+    print(f"✅ Catálogo compilado en {args.salida}: {meta['filas']} filas "
+          f"en {time.perf_counter() - inicio:.2f}s")
@@ -1,37 +1,13 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+from database import conectar_db, inicializar_db, expresion_fts
 
-DB_PATH = "crm_cotizaciones.sqlite"
-
-def conectar_db():
-    return sqlite3.connect(DB_PATH)
+# Filas que muestra la lista de clientes; para encontrar algo más se usa la búsqueda
+LIMITE_LISTA = 200
 
 def crear_tabla_clientes():
-    conn = conectar_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS clientes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT,
-            apellido_paterno TEXT,
-            apellido_materno TEXT,
-            empresa TEXT,
-            correo TEXT,
-            telefono TEXT,
-            rfc TEXT,
-            calle TEXT,
-            numero_exterior TEXT,
-            numero_interior TEXT,
-            codigo_postal TEXT,
-            municipio TEXT,
-            ciudad TEXT,
-            estado TEXT,
-            notas TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    # La tabla clientes forma parte de las migraciones de database.py
+    inicializar_db()
 
 def agregar_cliente(datos):
     conn = conectar_db()
@@ -66,6 +42,29 @@ def mostrar_clientes():
     finally:
         conn.close()
 
+def buscar_clientes(texto, limite=50):
+    """
+    Clientes que coinciden con `texto` en nombre, apellidos, empresa, correo, RFC o ciudad, del más
+    al menos relevante. Sin texto, los primeros por empresa.
+    """
+    expresion = expresion_fts(texto)
+    conn = conectar_db()
+    try:
+        if expresion:
+            return pd.read_sql_query("""
+                SELECT c.* FROM clientes_fts
+                JOIN clientes c ON c.id = clientes_fts.rowid
+                WHERE clientes_fts MATCH ?
+                ORDER BY bm25(clientes_fts, 3.0, 3.0, 3.0, 5.0, 2.0, 5.0, 1.0)
+                LIMIT ?
+            """, conn, params=(expresion, limite))
+        return pd.read_sql_query("SELECT * FROM clientes ORDER BY empresa ASC LIMIT ?", conn, params=(limite,))
+    except Exception as e:
+        st.error(f"Error al buscar clientes: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
 def vista_clientes():
     crear_tabla_clientes()
     st.header("Gestión de Clientes")
@@ -110,5 +109,8 @@ def vista_clientes():
             st.success("Cliente guardado correctamente")
 
     st.subheader("Lista de Clientes")
-    df = mostrar_clientes()
+    busqueda = st.text_input("🔎 Buscar por nombre, empresa, RFC, correo o ciudad", key="buscar_clientes")
+    df = buscar_clientes(busqueda, limite=LIMITE_LISTA)
+    if len(df) == LIMITE_LISTA:
+        st.caption(f"Se muestran los primeros {LIMITE_LISTA} clientes; usa la búsqueda para encontrar otros.")
     st.dataframe(df)
@@ -1,8 +1,8 @@
 # contactos.py
 import streamlit as st
 import pandas as pd
-from database import conectar_db
-from empresas import mostrar_empresas
+from database import conectar_db, expresion_fts
+from empresas import empresas_por_prefijo, LIMITE_LISTA
 
 def agregar_contacto(datos):
     conn = conectar_db()
@@ -29,12 +29,39 @@ def mostrar_contactos():
     conn.close()
     return df
 
+def buscar_contactos(texto, limite=50):
+    """Contactos que coinciden con `texto` en nombre, apellidos o correo, del más al menos relevante."""
+    expresion = expresion_fts(texto)
+    conn = conectar_db()
+    if expresion:
+        df = pd.read_sql_query("""
+            SELECT c.*, e.razon_social AS empresa
+            FROM contactos_fts
+            JOIN contactos c ON c.id = contactos_fts.rowid
+            LEFT JOIN empresas e ON c.empresa_id = e.id
+            WHERE contactos_fts MATCH ?
+            ORDER BY bm25(contactos_fts)
+            LIMIT ?
+        """, conn, params=(expresion, limite))
+    else:
+        df = pd.read_sql_query("""
+            SELECT c.*, e.razon_social AS empresa
+            FROM contactos c
+            LEFT JOIN empresas e ON c.empresa_id = e.id
+            ORDER BY e.razon_social, c.nombre
+            LIMIT ?
+        """, conn, params=(limite,))
+    conn.close()
+    return df
+
 def vista_contactos():
     st.title("👥 Gestión de Contactos")
 
     with st.expander("➕ Agregar nuevo contacto"):
-        empresas = mostrar_empresas()
-        if empresas.empty:
+        # Sólo se consultan las empresas que empiezan con lo escrito; el selector guarda el id
+        prefijo = st.text_input("Buscar empresa (inicio de la razón social)", key="contacto_prefijo_empresa")
+        empresas = {id_: (razon_social, rfc) for id_, razon_social, rfc in empresas_por_prefijo(prefijo)}
+        if not empresas and not prefijo:
             st.warning("⚠️ Primero debes registrar al menos una empresa.")
             st.stop()
 
@@ -44,11 +71,16 @@ def vista_contactos():
             apellido_materno = st.text_input("Apellido Materno")
             correo = st.text_input("Correo electrónico")
             telefono = st.text_input("Teléfono")
-            empresa_nombre = st.selectbox("Empresa asociada", empresas["razon_social"].tolist())
-            empresa_id = empresas[empresas["razon_social"] == empresa_nombre].iloc[0]["id"]
+            empresa_id = st.selectbox(
+                "Empresa asociada", list(empresas),
+                format_func=lambda id_: f"{empresas[id_][0]} — {empresas[id_][1] or 'sin RFC'}",
+                placeholder="Sin coincidencias",
+            )
 
             submitted = st.form_submit_button("Guardar contacto")
-            if submitted:
+            if submitted and empresa_id is None:
+                st.error("Selecciona la empresa del contacto.")
+            elif submitted:
                 datos = {
                     "nombre": nombre,
                     "apellido_paterno": apellido_paterno,
@@ -61,5 +93,8 @@ def vista_contactos():
                 st.success("✅ Contacto guardado exitosamente")
 
     st.subheader("📋 Lista de Contactos")
-    df = mostrar_contactos()
+    busqueda = st.text_input("🔎 Buscar por nombre o correo", key="buscar_contactos")
+    df = buscar_contactos(busqueda, limite=LIMITE_LISTA)
+    if len(df) == LIMITE_LISTA:
+        st.caption(f"Se muestran los primeros {LIMITE_LISTA} contactos; usa la búsqueda para encontrar otros.")
     st.dataframe(df, use_container_width=True)
@@ -1,83 +1,239 @@
 # cotizaciones.py
 import sqlite3
+import threading
+from collections import OrderedDict
 import pandas as pd
 from database import conectar_db
+from metricas import instrumentar
 
-def guardar_cotizacion(datos, productos_venta, productos_costo):
-    conn = conectar_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO cotizaciones (
-            cliente, contacto, propuesta, fecha, responsable,
-            total_venta, total_costo, utilidad, margen,
-            vigencia, condiciones_comerciales, usuario_id
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+INSERT_COTIZACION = """
+    INSERT INTO cotizaciones (
+        cliente, contacto, propuesta, fecha, responsable,
+        total_venta, total_costo, utilidad, margen,
+        vigencia, condiciones_comerciales, usuario_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_DETALLE = """
+    INSERT INTO detalle_productos (
+        cotizacion_id, producto, cantidad, precio_unitario,
+        precio_total, descuento_aplicado, tipo_origen
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _valores_cotizacion(datos):
+    return (
         datos["cliente"], datos["contacto"], datos["propuesta"], datos["fecha"], datos["responsable"],
         datos["total_venta"], datos["total_costo"], datos["utilidad"], datos["margen"],
-        datos["vigencia"], datos["condiciones_comerciales"], datos["usuario_id"]
-    ))
-    cotizacion_id = cursor.lastrowid
-
-    for p in productos_venta:
-        cursor.execute("""
-            INSERT INTO detalle_productos (
-                cotizacion_id, producto, cantidad, precio_unitario,
-                precio_total, descuento_aplicado, tipo_origen
-            ) VALUES (?, ?, ?, ?, ?, ?, 'venta')
-        """, (
-            cotizacion_id, p["Producto"], p["Cantidad"], p["Precio Unitario de Lista"],
-            p["Precio Total con Descuento"], p["Descuento %"]
-        ))
-
-    for p in productos_costo:
-        cursor.execute("""
-            INSERT INTO detalle_productos (
-                cotizacion_id, producto, cantidad, precio_unitario,
-                precio_total, descuento_aplicado, tipo_origen
-            ) VALUES (?, ?, ?, ?, ?, ?, 'costo')
-        """, (
-            cotizacion_id, p["Producto"], p["Cantidad"], p["Precio Base"],
-            p["Subtotal"], p["Item Disc. %"]
-        ))
-
-    conn.commit()
-    conn.close()
+        datos["vigencia"], datos["condiciones_comerciales"], datos.get("usuario_id")
+    )
+
+def filas_detalle(cotizacion_id, productos_venta, productos_costo):
+    filas = [
+        (cotizacion_id, p["Producto"], p["Cantidad"], p["Precio Unitario de Lista"],
+         p["Precio Total con Descuento"], p["Descuento %"], "venta")
+        for p in productos_venta
+    ]
+    filas.extend(
+        (cotizacion_id, p["Producto"], p["Cantidad"], p["Precio Base"],
+         p["Subtotal"], p["Item Disc. %"], "costo")
+        for p in productos_costo
+    )
+    return filas
+
+@instrumentar("guardar_cotizacion")
+def guardar_cotizacion(datos, productos_venta, productos_costo):
+    conn = conectar_db()
+    try:
+        # Encabezado y partidas en una sola transacción; BEGIN IMMEDIATE toma el candado de escritura
+        # desde el inicio para no fallar a medio guardado si otra sesión está escribiendo
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.execute(INSERT_COTIZACION, _valores_cotizacion(datos))
+        cotizacion_id = cursor.lastrowid
+        conn.executemany(INSERT_DETALLE, filas_detalle(cotizacion_id, productos_venta, productos_costo))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
     return cotizacion_id
 
+def importar_cotizaciones(cotizaciones, tamano_lote=1000):
+    """
+    Carga masiva de cotizaciones históricas. `cotizaciones` es un iterable de tuplas
+    (datos, productos_venta, productos_costo) con el mismo formato que `guardar_cotizacion`;
+    se consume en lotes de `tamano_lote` cotizaciones, cada lote en una transacción.
+    Regresa la cantidad de cotizaciones y de partidas importadas.
+    """
+    conn = conectar_db()
+    total_cotizaciones = 0
+    total_partidas = 0
+    try:
+        lote_detalle = []
+        en_lote = 0
+        conn.execute("BEGIN IMMEDIATE")
+        for datos, productos_venta, productos_costo in cotizaciones:
+            cotizacion_id = conn.execute(INSERT_COTIZACION, _valores_cotizacion(datos)).lastrowid
+            lote_detalle.extend(filas_detalle(cotizacion_id, productos_venta, productos_costo))
+            en_lote += 1
+            if en_lote >= tamano_lote:
+                conn.executemany(INSERT_DETALLE, lote_detalle)
+                conn.commit()
+                total_cotizaciones += en_lote
+                total_partidas += len(lote_detalle)
+                lote_detalle = []
+                en_lote = 0
+                conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(INSERT_DETALLE, lote_detalle)
+        conn.commit()
+        total_cotizaciones += en_lote
+        total_partidas += len(lote_detalle)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return total_cotizaciones, total_partidas
+
 def ver_historial(usuario):
     conn = conectar_db()
     if usuario["tipo"] == "superadmin":
-        query = "SELECT * FROM cotizaciones ORDER BY fecha DESC"
+        df = pd.read_sql_query("SELECT * FROM cotizaciones ORDER BY fecha DESC", conn)
     elif usuario["tipo"] == "admin":
-        query = f"""
-            SELECT * FROM cotizaciones
-            WHERE usuario_id IN (
-                SELECT id FROM usuarios WHERE admin_id = {usuario['id']} OR id = {usuario['id']}
-            ) ORDER BY fecha DESC
-        """
+        # Equipo completo del admin (todos los niveles) a través de la tabla de cierre
+        df = pd.read_sql_query("""
+            SELECT c.* FROM usuarios_jerarquia j
+            JOIN cotizaciones c ON c.usuario_id = j.descendiente_id
+            WHERE j.ancestro_id = ?
+            ORDER BY c.fecha DESC
+        """, conn, params=(usuario["id"],))
     else:
-        query = f"SELECT * FROM cotizaciones WHERE usuario_id = {usuario['id']} ORDER BY fecha DESC"
-
-    df = pd.read_sql_query(query, conn)
+        df = pd.read_sql_query(
+            "SELECT * FROM cotizaciones WHERE usuario_id = ? ORDER BY fecha DESC", conn, params=(usuario["id"],)
+        )
     conn.close()
     return df
 
-def obtener_detalle_cotizacion(cotizacion_id):
+def _filtro_visibilidad(usuario):
+    # Qué cotizaciones puede ver cada tipo de usuario (mismas reglas que ver_historial)
+    if usuario is None or usuario["tipo"] == "superadmin":
+        return "", []
+    if usuario["tipo"] == "admin":
+        return (
+            "usuario_id IN (SELECT descendiente_id FROM usuarios_jerarquia WHERE ancestro_id = ?)",
+            [usuario["id"]],
+        )
+    return "usuario_id = ?", [usuario["id"]]
+
+def condiciones_historial(usuario=None, cliente=None, responsable=None, fecha_desde=None, fecha_hasta=None,
+                          margen_min=None, margen_max=None):
+    """Condiciones WHERE (sobre cotizaciones) y parámetros de los filtros del historial."""
+    condiciones = []
+    parametros = []
+
+    visibilidad, params_visibilidad = _filtro_visibilidad(usuario)
+    if visibilidad:
+        condiciones.append(visibilidad)
+        parametros.extend(params_visibilidad)
+    if cliente:
+        condiciones.append("cliente LIKE ?")
+        parametros.append(f"%{cliente}%")
+    if responsable:
+        condiciones.append("responsable LIKE ?")
+        parametros.append(f"%{responsable}%")
+    if fecha_desde:
+        condiciones.append("fecha >= ?")
+        parametros.append(str(fecha_desde))
+    if fecha_hasta:
+        condiciones.append("fecha <= ?")
+        parametros.append(str(fecha_hasta))
+    if margen_min is not None:
+        condiciones.append("margen >= ?")
+        parametros.append(margen_min)
+    if margen_max is not None:
+        condiciones.append("margen <= ?")
+        parametros.append(margen_max)
+    return condiciones, parametros
+
+def ver_historial_paginado(usuario=None, cliente=None, responsable=None, fecha_desde=None, fecha_hasta=None,
+                           margen_min=None, margen_max=None, despues_de=None, limite=50):
+    """
+    Una página del historial, de la más reciente a la más antigua, usando paginación por llave
+    sobre (fecha, id) en lugar de OFFSET: cada página cuesta lo mismo sin importar cuántas haya antes.
+    `despues_de` es el cursor (fecha, id) que regresó la página anterior.
+    Regresa (df, cursor_siguiente); cursor_siguiente es None si ya no hay más páginas.
+    """
+    condiciones, parametros = condiciones_historial(
+        usuario, cliente, responsable, fecha_desde, fecha_hasta, margen_min, margen_max
+    )
+    if despues_de is not None:
+        condiciones.append("(fecha, id) < (?, ?)")
+        parametros.extend(despues_de)
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    # Se pide una fila de más sólo para saber si existe una página siguiente
+    query = f"SELECT * FROM cotizaciones {where} ORDER BY fecha DESC, id DESC LIMIT ?"
+
     conn = conectar_db()
-    datos = pd.read_sql_query(f"SELECT * FROM cotizaciones WHERE id = {cotizacion_id}", conn).iloc[0]
+    df = pd.read_sql_query(query, conn, params=parametros + [limite + 1])
+    conn.close()
+
+    cursor_siguiente = None
+    if len(df) > limite:
+        df = df.iloc[:limite]
+        ultima = df.iloc[-1]
+        cursor_siguiente = (ultima["fecha"], int(ultima["id"]))
+    return df, cursor_siguiente
+
+COLUMNAS_PARTIDA = ["producto", "cantidad", "precio_unitario", "precio_total", "descuento_aplicado"]
 
-    venta = pd.read_sql_query(f"""
-        SELECT producto, cantidad, precio_unitario, precio_total, descuento_aplicado
-        FROM detalle_productos
-        WHERE cotizacion_id = {cotizacion_id} AND tipo_origen = 'venta'
-    """, conn)
+# Caché LRU de detalles ya consultados: {cotizacion_id: (datos, venta, costo)}.
+# Todo lo que modifique una cotización ya guardada (encabezado o partidas) debe llamar a
+# invalidar_detalle_cotizacion() con su id después del commit.
+TAMANO_CACHE_DETALLES = 256
+_cache_detalles = OrderedDict()
+_cache_detalles_lock = threading.Lock()
 
-    costo = pd.read_sql_query(f"""
-        SELECT producto, cantidad, precio_unitario, precio_total, descuento_aplicado
-        FROM detalle_productos
-        WHERE cotizacion_id = {cotizacion_id} AND tipo_origen = 'costo'
-    """, conn)
+def invalidar_detalle_cotizacion(cotizacion_id):
+    with _cache_detalles_lock:
+        _cache_detalles.pop(int(cotizacion_id), None)
 
+def limpiar_cache_detalles():
+    with _cache_detalles_lock:
+        _cache_detalles.clear()
+
+def obtener_detalle_cotizacion(cotizacion_id):
+    """
+    Encabezado, partidas de venta y partidas de costo de una cotización, leídos con una sola
+    consulta y guardados en caché. Los objetos devueltos se comparten entre llamadas: son de sólo lectura.
+    """
+    cotizacion_id = int(cotizacion_id)
+    with _cache_detalles_lock:
+        if cotizacion_id in _cache_detalles:
+            _cache_detalles.move_to_end(cotizacion_id)
+            return _cache_detalles[cotizacion_id]
+
+    conn = conectar_db()
+    df = pd.read_sql_query("""
+        SELECT c.*, d.producto, d.cantidad, d.precio_unitario, d.precio_total,
+               d.descuento_aplicado, d.tipo_origen
+        FROM cotizaciones c
+        LEFT JOIN detalle_productos d ON d.cotizacion_id = c.id
+        WHERE c.id = ?
+        ORDER BY d.id
+    """, conn, params=(cotizacion_id,))
     conn.close()
-    return datos, venta, costo
+
+    columnas_encabezado = [col for col in df.columns if col not in COLUMNAS_PARTIDA + ["tipo_origen"]]
+    datos = df[columnas_encabezado].iloc[0]
+    venta = df.loc[df["tipo_origen"] == "venta", COLUMNAS_PARTIDA].reset_index(drop=True)
+    costo = df.loc[df["tipo_origen"] == "costo", COLUMNAS_PARTIDA].reset_index(drop=True)
+    resultado = (datos, venta, costo)
+
+    with _cache_detalles_lock:
+        _cache_detalles[cotizacion_id] = resultado
+        _cache_detalles.move_to_end(cotizacion_id)
+        while len(_cache_detalles) > TAMANO_CACHE_DETALLES:
+            _cache_detalles.popitem(last=False)
+    return resultado
@@ -1,148 +1,85 @@
 
+import os
+import tempfile
+from io import BytesIO
 import streamlit as st
 import pandas as pd
-import sqlite3
-import os
 from datetime import date
 from clientes_module import vista_clientes
+from database import inicializar_db
+from cotizaciones import guardar_cotizacion, ver_historial_paginado, obtener_detalle_cotizacion
+from reportes import vista_resumen_ventas
+from catalogo import cargar_catalogo, compactar_catalogo, construir_indice_tiers, buscar_precio
+from motor_precios import cotizar
 
 from fpdf import FPDF
+from pdf_utils import cache_pdfs, clave_pdf, pdf_a_bytes, imagen_logo
+from exportar_propuestas import ids_cotizaciones, exportar_zip
+from exportar_excel import exportar_cotizacion_excel, exportar_historial_excel
+from metricas import registrar_sesion, marcar_rss_base, memoria_por_sesion, instrumentar, vista_metricas
 
-# Crear ruta segura para base de datos en entorno escribible
-DB_PATH = os.path.join(os.getcwd(), "crm_cotizaciones.sqlite")
-
-# ========================
-# Crear base y tablas si no existen
-# ========================
-def inicializar_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS cotizaciones (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            cliente TEXT,
-            contacto TEXT,
-            propuesta TEXT,
-            fecha TEXT,
-            responsable TEXT,
-            total_venta REAL,
-            total_costo REAL,
-            utilidad REAL,
-            margen REAL
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS detalle_productos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            cotizacion_id INTEGER,
-            producto TEXT,
-            cantidad INTEGER,
-            precio_unitario REAL,
-            precio_total REAL,
-            descuento_aplicado REAL,
-            tipo_origen TEXT,
-            FOREIGN KEY (cotizacion_id) REFERENCES cotizaciones(id)
-        )
-    """)
-    
-    # Verificar y agregar columnas nuevas si no existen
-    columnas = [col[1] for col in cursor.execute("PRAGMA table_info(cotizaciones)").fetchall()]
-    if "vigencia" not in columnas:
-        cursor.execute("ALTER TABLE cotizaciones ADD COLUMN vigencia TEXT;")
-    if "condiciones_comerciales" not in columnas:
-        cursor.execute("ALTER TABLE cotizaciones ADD COLUMN condiciones_comerciales TEXT;")
-
-    conn.commit()
-    conn.close()
-
-def conectar_db():
-    return sqlite3.connect(DB_PATH)
-
-def guardar_cotizacion(datos, productos_venta, productos_costo):
-    conn = conectar_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO cotizaciones (cliente, contacto, propuesta, fecha, responsable, total_venta, total_costo, utilidad, margen, vigencia, condiciones_comerciales)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        datos["cliente"], datos["contacto"], datos["propuesta"], datos["fecha"],
-        datos["responsable"], datos["total_venta"], datos["total_costo"],
-        datos["utilidad"], datos["margen"], datos["vigencia"], datos["condiciones_comerciales"]
-    ))
-    cotizacion_id = cursor.lastrowid
-
-    for p in productos_venta:
-        cursor.execute("""
-            INSERT INTO detalle_productos (cotizacion_id, producto, cantidad, precio_unitario, precio_total, descuento_aplicado, tipo_origen)
-            VALUES (?, ?, ?, ?, ?, ?, 'venta')
-        """, (
-            cotizacion_id, p["Producto"], p["Cantidad"], p["Precio Unitario de Lista"],
-            p["Precio Total con Descuento"], p["Descuento %"]
-        ))
-
-    for p in productos_costo:
-        cursor.execute("""
-            INSERT INTO detalle_productos (cotizacion_id, producto, cantidad, precio_unitario, precio_total, descuento_aplicado, tipo_origen)
-            VALUES (?, ?, ?, ?, ?, ?, 'costo')
-        """, (
-            cotizacion_id, p["Producto"], p["Cantidad"], p["Precio Base"],
-            p["Subtotal"], p["Item Disc. %"]
-        ))
-
-    
-    # Verificar y agregar columnas nuevas si no existen
-    columnas = [col[1] for col in cursor.execute("PRAGMA table_info(cotizaciones)").fetchall()]
-    if "vigencia" not in columnas:
-        cursor.execute("ALTER TABLE cotizaciones ADD COLUMN vigencia TEXT;")
-    if "condiciones_comerciales" not in columnas:
-        cursor.execute("ALTER TABLE cotizaciones ADD COLUMN condiciones_comerciales TEXT;")
-
-    conn.commit()
-    conn.close()
-    return cotizacion_id
-
-def ver_historial():
-    conn = conectar_db()
-    df = pd.read_sql_query("SELECT * FROM cotizaciones ORDER BY fecha DESC", conn)
-    conn.close()
-    return df
-
-# Inicializar base si es primera vez
-inicializar_db()
-
-@st.cache_data
-def cargar_datos():
-    df = pd.read_excel("precios_threatdown.xlsx")
-    df["Tier Min"] = pd.to_numeric(df["Tier Min"], errors="coerce")
-    df["Tier Max"] = pd.to_numeric(df["Tier Max"], errors="coerce")
-    return df.dropna(subset=["Tier Min", "Tier Max"])
-
-df_precios = cargar_datos()
-
-# Mover selección de término aquí antes de usarlo
-terminos_disponibles = sorted(df_precios["Term (Month)"].dropna().unique())
-termino_seleccionado = st.selectbox("Selecciona el plazo del servicio (en meses):", terminos_disponibles)
+TAMANO_PAGINA_HISTORIAL = 50
 
-# Agregar producto personalizado como opción inicial
-producto_personalizado_placeholder = {
+# Producto personalizado que se ofrece como opción inicial en cada plazo
+PRODUCTO_PERSONALIZADO = {
     "Product Title": "Producto personalizado (opcional)",
     "MSRP USD": 0.0,
     "Tier Min": 1,
     "Tier Max": 9999,
-    "Term (Month)": termino_seleccionado
 }
-df_precios = pd.concat([df_precios, pd.DataFrame([producto_personalizado_placeholder])], ignore_index=True)
+
+@st.cache_resource
+@instrumentar("preparar_app")
+def preparar_app():
+    """
+    Trabajo de arranque que no depende de la sesión: esquema de la base, catálogo con el producto
+    personalizado en todos los plazos, índice de tiers y listas de plazos y productos.
+    Se ejecuta una vez por proceso y todas las sesiones comparten el resultado sin copiarlo,
+    por eso el catálogo es de sólo lectura y las listas son tuplas.
+    """
+    inicializar_db()
+    df_precios = cargar_catalogo()
+    terminos = tuple(int(t) for t in sorted(df_precios["Term (Month)"].dropna().unique()))
+    df_precios = compactar_catalogo(pd.concat(
+        [df_precios, pd.DataFrame([{**PRODUCTO_PERSONALIZADO, "Term (Month)": t} for t in terminos])],
+        ignore_index=True,
+    ))
+    indice = construir_indice_tiers(df_precios)
+    productos_por_termino = {t: [] for t in terminos}
+    for termino, producto in indice:
+        productos_por_termino[termino].append(producto)
+    productos_por_termino = {t: tuple(productos) for t, productos in productos_por_termino.items()}
+    marcar_rss_base()
+    return df_precios, terminos, indice, productos_por_termino
+
+registrar_sesion()
+df_precios, terminos_disponibles, indice_tiers, productos_por_termino = preparar_app()
+
+termino_seleccionado = st.selectbox("Selecciona el plazo del servicio (en meses):", terminos_disponibles)
 
 
 
 st.title("Cotizador ThreatDown con CRM")
 
-menu = st.sidebar.selectbox("Secciones", ["Cotizaciones", "Clientes"])
+menu = st.sidebar.selectbox("Secciones", ["Cotizaciones", "Clientes", "Resumen de ventas", "Métricas"])
+
+rss, sesiones, rss_sesion = memoria_por_sesion()
+if rss is not None:
+    st.sidebar.caption(f"Memoria del proceso: {rss / 2**20:,.0f} MB · {sesiones} sesiones · "
+                       f"{rss_sesion / 2**20:,.1f} MB por sesión")
 
 if menu == "Clientes":
     vista_clientes()
     st.stop()
 
+if menu == "Resumen de ventas":
+    vista_resumen_ventas()
+    st.stop()
+
+if menu == "Métricas":
+    vista_metricas()
+    st.stop()
+
 
 st.sidebar.header("Datos de la cotización")
 cliente = st.sidebar.text_input("Cliente")
@@ -163,47 +100,28 @@ condiciones_comerciales = st.text_area(
 )
 
 
-terminos_disponibles = sorted(df_precios["Term (Month)"].dropna().unique())
-
-df_filtrado_termino = df_precios[df_precios["Term (Month)"] == termino_seleccionado]
-productos = df_filtrado_termino["Product Title"].unique()
+productos = productos_por_termino[termino_seleccionado]
 seleccion = st.multiselect("Selecciona los productos que deseas cotizar:", productos)
 
-cotizacion = []
-productos_para_tabla_secundaria = []
+lineas = []
 
 for prod in seleccion:
-    df_producto = df_filtrado_termino[df_filtrado_termino["Product Title"] == prod]
     cantidad = st.number_input(f"Cantidad de '{prod}':", min_value=1, value=1, step=1)
 
-    df_rango = df_producto[(df_producto["Tier Min"] <= cantidad) & (df_producto["Tier Max"] >= cantidad)]
-    if not df_rango.empty:
-        fila = df_rango.iloc[0]
-        precio_base = fila["MSRP USD"]
+    precio_base = buscar_precio(indice_tiers, termino_seleccionado, prod, cantidad)
+    if precio_base is not None:
 
         item_disc = st.number_input(f"Descuento 'Item' (%) para '{prod}':", 0.0, 100.0, 0.0)
         channel_disc = st.number_input(f"Descuento 'Channel Disc.' (%) para '{prod}':", 0.0, 100.0, 0.0)
         deal_reg_disc = st.number_input(f"Descuento 'Deal Reg. Disc.' (%) para '{prod}':", 0.0, 100.0, 0.0)
 
-        precio1 = precio_base * (1 - item_disc / 100)
-        total_channel = channel_disc + deal_reg_disc
-        precio_final = precio1 * (1 - total_channel / 100)
-        subtotal = precio_final * cantidad
-
-        cotizacion.append({
-            "Producto": prod,
-            "Cantidad": cantidad,
-            "Precio Base": precio_base,
-            "Item Disc. %": item_disc,
-            "Channel + Deal Disc. %": total_channel,
-            "Precio Final Unitario": round(precio_final, 2),
-            "Subtotal": round(subtotal, 2)
-        })
-
-        productos_para_tabla_secundaria.append({
-            "Producto": prod,
-            "Cantidad": cantidad,
-            "Precio Unitario de Lista": precio_base
+        lineas.append({
+            "producto": prod,
+            "cantidad": cantidad,
+            "precio_base": precio_base,
+            "item_disc": item_disc,
+            "channel_disc": channel_disc,
+            "deal_reg_disc": deal_reg_disc,
         })
     else:
         st.warning(f"No hay precios disponibles para '{prod}' con cantidad {cantidad}.")
@@ -216,47 +134,40 @@ if cliente or propuesta or responsable:
     st.markdown(f"**Fecha:** {fecha.strftime('%Y-%m-%d')}")
     st.markdown(f"**Responsable:** {responsable}")
 
-costo_total = 0
-if cotizacion:
-    df_cotizacion = pd.DataFrame(cotizacion)
-    st.subheader("Resumen de Cotización (costos)")
-    st.dataframe(df_cotizacion)
-    costo_total = df_cotizacion["Subtotal"].sum()
-    st.success(f"Costo total con descuentos aplicados: ${costo_total:,.2f}")
+# Las tablas se dibujan en contenedores reservados para poder calcular todo con una sola
+# llamada al motor de precios, después de leer también los descuentos directos
+bloque_costos = st.container()
 
-precio_venta_total = 0
-tabla_descuento = []
-if productos_para_tabla_secundaria:
+if lineas:
     st.subheader("Análisis: Precio de venta con descuento directo sobre lista")
-    for item in productos_para_tabla_secundaria:
-        prod = item["Producto"]
-        cantidad = item["Cantidad"]
-        precio_unitario = item["Precio Unitario de Lista"]
-        precio_total_lista = precio_unitario * cantidad
-
-        descuento_directo = st.number_input(f"Descuento directo (%) sobre lista para '{prod}':",
-                                            0.0, 100.0, 0.0, key=f"direct_discount_{prod}")
-        precio_con_descuento = precio_total_lista * (1 - descuento_directo / 100)
-
-        tabla_descuento.append({
-            "Producto": prod,
-            "Cantidad": cantidad,
-            "Precio Unitario de Lista": round(precio_unitario, 2),
-            "Precio Total de Lista": round(precio_total_lista, 2),
-            "Descuento %": descuento_directo,
-            "Precio Total con Descuento": round(precio_con_descuento, 2)
-        })
-
-    df_tabla_descuento = pd.DataFrame(tabla_descuento)
-    st.dataframe(df_tabla_descuento)
-    precio_venta_total = df_tabla_descuento["Precio Total con Descuento"].sum()
-    st.success(f"Precio total de venta: ${precio_venta_total:,.2f}")
+    for linea in lineas:
+        prod = linea["producto"]
+        linea["descuento_directo"] = st.number_input(f"Descuento directo (%) sobre lista para '{prod}':",
+                                                     0.0, 100.0, 0.0, key=f"direct_discount_{prod}")
+    bloque_venta = st.container()
 else:
     st.info("Aún no hay productos válidos para aplicar descuento directo.")
 
+costo_total = 0
+precio_venta_total = 0
+if lineas:
+    resultado = cotizar(lineas)
+    df_cotizacion = resultado["costo"]
+    df_tabla_descuento = resultado["venta"]
+    costo_total = resultado["costo_total"]
+    precio_venta_total = resultado["venta_total"]
+
+    with bloque_costos:
+        st.subheader("Resumen de Cotización (costos)")
+        st.dataframe(df_cotizacion)
+        st.success(f"Costo total con descuentos aplicados: ${costo_total:,.2f}")
+
+    with bloque_venta:
+        st.dataframe(df_tabla_descuento)
+        st.success(f"Precio total de venta: ${precio_venta_total:,.2f}")
+
 if precio_venta_total > 0 and costo_total > 0:
-    utilidad = precio_venta_total - costo_total
-    margen = (utilidad / precio_venta_total) * 100
+    utilidad, margen = resultado["utilidad"], resultado["margen"]
     st.subheader("Utilidad de la operación")
     col1, col2 = st.columns(2)
     col1.metric("Utilidad total", f"${utilidad:,.2f}")
@@ -280,11 +191,77 @@ if precio_venta_total > 0 and costo_total > 0:
         st.success("✅ Cotización guardada en CRM")
 
 st.subheader("📋 Historial de cotizaciones")
-try:
-    df_hist = ver_historial()
-    st.dataframe(df_hist)
-except:
+with st.expander("Filtros del historial"):
+    col1, col2 = st.columns(2)
+    filtro_cliente = col1.text_input("Cliente contiene", key="historial_cliente")
+    filtro_responsable = col2.text_input("Responsable contiene", key="historial_responsable")
+    rango_fechas = col1.date_input("Rango de fechas", value=[], key="historial_fechas")
+    filtro_margen = col2.number_input("Margen mínimo (%)", value=None, key="historial_margen")
+
+filtros_historial = {
+    "cliente": filtro_cliente,
+    "responsable": filtro_responsable,
+    "fecha_desde": rango_fechas[0].strftime('%Y-%m-%d') if len(rango_fechas) > 0 else None,
+    "fecha_hasta": rango_fechas[1].strftime('%Y-%m-%d') if len(rango_fechas) > 1 else None,
+    "margen_min": filtro_margen,
+}
+# Pila de cursores (fecha, id) de las páginas visitadas; se reinicia cuando cambian los filtros
+if st.session_state.get("historial_filtros") != filtros_historial:
+    st.session_state["historial_filtros"] = filtros_historial
+    st.session_state["historial_cursores"] = [None]
+cursores_historial = st.session_state["historial_cursores"]
+
+df_hist, cursor_siguiente = ver_historial_paginado(
+    **filtros_historial, despues_de=cursores_historial[-1], limite=TAMANO_PAGINA_HISTORIAL
+)
+if df_hist.empty:
     st.warning("No hay cotizaciones guardadas aún.")
+else:
+    st.dataframe(df_hist)
+
+col_anterior, col_pagina, col_siguiente = st.columns(3)
+if col_anterior.button("⬅️ Anterior", disabled=len(cursores_historial) == 1):
+    cursores_historial.pop()
+    st.rerun()
+col_pagina.caption(f"Página {len(cursores_historial)}")
+if col_siguiente.button("Siguiente ➡️", disabled=cursor_siguiente is None):
+    cursores_historial.append(cursor_siguiente)
+    st.rerun()
+
+# Exporta todas las propuestas que cumplen los filtros (no sólo la página visible)
+if st.button("📦 Exportar propuestas filtradas (ZIP)", disabled=df_hist.empty):
+    ids_exportar = list(ids_cotizaciones(**filtros_historial))
+    barra = st.progress(0.0, text=f"0/{len(ids_exportar)} propuestas")
+    # Un archivo propio por exportación: dos sesiones no comparten ni se pisan el ZIP
+    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as temporal:
+        ruta_zip = temporal.name
+    try:
+        errores = exportar_zip(
+            ruta_zip, ids_exportar,
+            progreso=lambda hechas, total: barra.progress(hechas / total, text=f"{hechas}/{total} propuestas"),
+        )
+        with open(ruta_zip, "rb") as f:
+            contenido_zip = f.read()
+    finally:
+        os.remove(ruta_zip)
+    for cotizacion_id, error in errores:
+        st.warning(f"No se pudo generar la propuesta {cotizacion_id}: {error}")
+    st.download_button("⬇️ Descargar ZIP", data=contenido_zip, file_name=f"propuestas_{date.today():%Y%m%d}.zip",
+                       mime="application/zip")
+
+if st.button("📊 Exportar historial filtrado (Excel)", disabled=df_hist.empty):
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as temporal:
+        ruta_excel = temporal.name
+    try:
+        with st.spinner("Generando Excel..."):
+            total_cotizaciones, total_partidas = exportar_historial_excel(ruta_excel, **filtros_historial)
+        with open(ruta_excel, "rb") as f:
+            contenido_excel = f.read()
+    finally:
+        os.remove(ruta_excel)
+    st.caption(f"{total_cotizaciones:,} cotizaciones · {total_partidas:,} partidas")
+    st.download_button("⬇️ Descargar Excel", data=contenido_excel, file_name=f"historial_{date.today():%Y%m%d}.xlsx",
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 
 
@@ -293,8 +270,8 @@ except:
 # =============================
 st.subheader("🔍 Ver detalle de cotización")
 
-conn = conectar_db()
-df_cotizaciones = pd.read_sql_query("SELECT id, propuesta, cliente, fecha FROM cotizaciones ORDER BY fecha DESC", conn)
+# Sólo se ofrecen las cotizaciones de la página visible del historial
+df_cotizaciones = df_hist[["id", "propuesta", "cliente", "fecha"]].copy()
 
 if df_cotizaciones.empty:
     st.info("No hay cotizaciones guardadas para mostrar el detalle.")
@@ -305,8 +282,10 @@ else:
     if seleccion_resumen:
         cotizacion_id = int(df_cotizaciones[df_cotizaciones["Resumen"] == seleccion_resumen]["id"].values[0])
         
+        # Encabezado y partidas en una sola consulta, en caché entre reruns
+        datos, df_venta, df_costo = obtener_detalle_cotizacion(cotizacion_id)
+
         # Datos generales
-        datos = pd.read_sql_query(f"SELECT * FROM cotizaciones WHERE id = {cotizacion_id}", conn).iloc[0]
         st.markdown(f"**Cliente:** {datos['cliente']}")
         st.markdown(f"**Contacto:** {datos['contacto']}")
         st.markdown(f"**Propuesta:** {datos['propuesta']}")
@@ -319,27 +298,15 @@ else:
 
         # Productos de venta
         st.markdown("### Productos cotizados (venta)")
-        df_venta = pd.read_sql_query(f'''
-            SELECT producto, cantidad, precio_unitario, precio_total, descuento_aplicado
-            FROM detalle_productos
-            WHERE cotizacion_id = {cotizacion_id} AND tipo_origen = 'venta'
-        ''', conn)
         st.dataframe(df_venta)
 
         # Productos de costo
         st.markdown("### Productos base (costos)")
-        df_costo = pd.read_sql_query(f'''
-            SELECT producto, cantidad, precio_unitario, precio_total, descuento_aplicado
-            FROM detalle_productos
-            WHERE cotizacion_id = {cotizacion_id} AND tipo_origen = 'costo'
-        ''', conn)
         st.dataframe(df_costo)
 
-conn.close()
-
 class CotizacionPDFConLogo(FPDF):
     def header(self):
-        self.image("LOGO Syn Apps Sys_edited (2).png", x=10, y=8, w=50)
+        imagen_logo(self, "LOGO Syn Apps Sys_edited (2).png", x=10, y=8, w=50)
         self.set_font("Helvetica", "B", 16)
         self.set_xy(70, 12)
         self.cell(0, 10, "Cotización de Servicios", ln=True, align="L")
@@ -392,12 +359,20 @@ class CotizacionPDFConLogo(FPDF):
         self.cell(0, 8, responsable, ln=True)
         self.cell(0, 8, "SYNAPPSSYS", ln=True)
 
+@instrumentar("generar_pdf")
+def generar_pdf_cliente(datos_dict, productos, total_venta, vigencia, condiciones):
+    pdf = CotizacionPDFConLogo()
+    pdf.add_page()
+    pdf.encabezado_cliente(datos_dict)
+    pdf.tabla_productos(productos)
+    pdf.totales(total_venta)
+    pdf.condiciones(vigencia, condiciones)
+    pdf.firma(datos_dict["responsable"])
+    return pdf_a_bytes(pdf)
+
 # Botón para generar PDF desde vista de detalle
 if 'cotizacion_id' in locals():
     if st.button("📄 Generar PDF para cliente"):
-        pdf = CotizacionPDFConLogo()
-        pdf.add_page()
-
         datos_dict = {
             "cliente": datos["cliente"],
             "contacto": datos["contacto"],
@@ -413,18 +388,26 @@ if 'cotizacion_id' in locals():
 
         total_venta = datos["total_venta"]
 
-        pdf.encabezado_cliente(datos_dict)
-        pdf.tabla_productos(productos)
-        pdf.totales(total_venta)
-        pdf.condiciones(datos["vigencia"], datos["condiciones_comerciales"])
-        pdf.firma(datos["responsable"])
-
-        pdf_output_path = f"cotizacion_cliente_{cotizacion_id}.pdf"
-        pdf.output(pdf_output_path)
-        with open(pdf_output_path, "rb") as file:
-            st.download_button(
-                label="📥 Descargar PDF de cotización",
-                data=file,
-                file_name=pdf_output_path,
-                mime="application/pdf"
-            )
+        # Se genera en memoria y se reutiliza mientras el contenido no cambie
+        clave = clave_pdf("cotizacion_cliente", datos_dict, productos, total_venta,
+                          datos["vigencia"], datos["condiciones_comerciales"])
+        pdf_bytes = cache_pdfs.obtener(clave, lambda: generar_pdf_cliente(
+            datos_dict, productos, total_venta, datos["vigencia"], datos["condiciones_comerciales"]
+        ))
+
+        st.download_button(
+            label="📥 Descargar PDF de cotización",
+            data=pdf_bytes,
+            file_name=f"cotizacion_cliente_{cotizacion_id}.pdf",
+            mime="application/pdf"
+        )
+
+    # El Excel no depende del botón del PDF: se ofrece siempre junto a la cotización seleccionada
+    excel_cotizacion = BytesIO()
+    exportar_cotizacion_excel(cotizacion_id, excel_cotizacion)
+    st.download_button(
+        label="📊 Descargar Excel de cotización",
+        data=excel_cotizacion.getvalue(),
+        file_name=f"cotizacion_{cotizacion_id}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
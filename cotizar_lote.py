@@ -0,0 +1,262 @@
+# cotizar_lote.py
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from catalogo import RUTA_CATALOGO, RUTA_EXCEL, cargar_catalogo, construir_indice_tiers, buscar_precio
+from motor_precios import cotizar
+
+COLUMNAS_ENTRADA = [
+    "cotizacion", "termino", "producto", "cantidad",
+    "item_disc", "channel_disc", "deal_reg_disc", "descuento_directo",
+]
+COLUMNAS_LINEAS = [
+    "cotizacion", "termino", "producto", "cantidad", "estado",
+    "precio_base", "precio_final_unitario", "subtotal_costo",
+    "precio_total_lista", "precio_total_venta", "motivo",
+]
+COLUMNAS_RESUMEN = [
+    "cotizacion", "lineas", "sin_precio", "errores", "total_costo", "total_venta", "utilidad", "margen",
+]
+
+ERRORES = COLUMNAS_RESUMEN.index("errores")
+
+# Índice de tiers de cada proceso trabajador; se construye una sola vez en _inicializar_trabajador
+_indice = None
+
+
+def _inicializar_trabajador(ruta_excel, ruta_catalogo):
+    global _indice
+    _indice = construir_indice_tiers(cargar_catalogo(ruta_excel, ruta_catalogo))
+
+
+def _numero(fila, campo, tipo=float, defecto=0):
+    valor = fila.get(campo)
+    if valor is None or valor == "":
+        return defecto
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{campo}' no es numérico: {valor!r}") from None
+    if not math.isfinite(numero):
+        raise ValueError(f"'{campo}' no es un número finito: {valor!r}")
+    if tipo is int:
+        # "12.0" (columnas exportadas desde Excel) es 12; "1.5" no se redondea en silencio
+        if not numero.is_integer():
+            raise ValueError(f"'{campo}' debe ser entero: {valor!r}")
+        return int(numero)
+    return numero
+
+
+def _linea(fila):
+    """Tupla de COLUMNAS_ENTRADA + motivo (None) de una fila; ValueError con el motivo si no es válida."""
+    if not isinstance(fila, dict):
+        raise ValueError("la línea no es un objeto JSON")
+    cotizacion = fila.get("cotizacion")
+    if cotizacion is None or str(cotizacion).strip() == "":
+        raise ValueError("falta 'cotizacion'")
+    if not fila.get("producto"):
+        raise ValueError("falta 'producto'")
+    return (
+        str(cotizacion),
+        _numero(fila, "termino", int),
+        fila["producto"],
+        _numero(fila, "cantidad", int, 1),
+        _numero(fila, "item_disc"),
+        _numero(fila, "channel_disc"),
+        _numero(fila, "deal_reg_disc"),
+        _numero(fila, "descuento_directo"),
+        None,
+    )
+
+
+def _linea_con_error(fila, motivo):
+    # Sale en el resultado con estado "error" y sin precios, en su lugar dentro del orden de entrada
+    fila = fila if isinstance(fila, dict) else {}
+    cotizacion = fila.get("cotizacion")
+    return (
+        "" if cotizacion is None else str(cotizacion), None, fila.get("producto"), None, 0, 0, 0, 0, motivo,
+    )
+
+
+def leer_lineas(ruta):
+    """
+    Genera las líneas de entrada (CSV o JSONL) una por una, sin cargar el archivo completo.
+    Una fila que no se puede interpretar no detiene el lote: se genera con su motivo de error.
+    """
+    f = sys.stdin if ruta == "-" else open(ruta, newline="", encoding="utf-8")
+    try:
+        if ruta.endswith(".jsonl"):
+            filas = (linea for linea in f if linea.strip())
+        else:
+            filas = csv.DictReader(f)
+        for fila in filas:
+            try:
+                if isinstance(fila, str):
+                    try:
+                        fila = json.loads(fila)
+                    except ValueError:
+                        raise ValueError("JSON inválido") from None
+                yield _linea(fila)
+            except ValueError as e:
+                yield _linea_con_error(fila, str(e))
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def agrupar_en_bloques(lineas, tamano_bloque):
+    # Los bloques sólo se cortan entre cotizaciones para que cada proceso pueda totalizarlas completas
+    bloque = []
+    for linea in lineas:
+        if len(bloque) >= tamano_bloque and linea[0] != bloque[-1][0]:
+            yield bloque
+            bloque = []
+        bloque.append(linea)
+    if bloque:
+        yield bloque
+
+
+def cotizar_bloque(bloque):
+    df = pd.DataFrame(bloque, columns=COLUMNAS_ENTRADA + ["motivo"])
+    con_error = df["motivo"].notna()
+    if con_error.any():
+        # Enteros con nulos: las líneas con error no tienen término ni cantidad
+        df = df.astype({"termino": "Int64", "cantidad": "Int64"})
+        df["precio_base"] = [
+            None if error else buscar_precio(_indice, termino, producto, cantidad)
+            for termino, producto, cantidad, error in zip(df["termino"], df["producto"], df["cantidad"], con_error)
+        ]
+    else:
+        df["precio_base"] = [
+            buscar_precio(_indice, termino, producto, cantidad)
+            for termino, producto, cantidad in zip(df["termino"], df["producto"], df["cantidad"])
+        ]
+    df["precio_base"] = df["precio_base"].astype(float)
+    validas = df["precio_base"].notna()
+    df["estado"] = "ok"
+    df.loc[~validas, "estado"] = "sin_precio"
+    df.loc[con_error, "estado"] = "error"
+
+    for col in ["precio_final_unitario", "subtotal_costo", "precio_total_lista", "precio_total_venta"]:
+        df[col] = float("nan")
+    if validas.any():
+        resultado = cotizar(df[validas].astype({"cantidad": "int64"}))
+        df.loc[validas, "precio_final_unitario"] = resultado["costo"]["Precio Final Unitario"].to_numpy()
+        df.loc[validas, "subtotal_costo"] = resultado["costo"]["Subtotal"].to_numpy()
+        df.loc[validas, "precio_total_lista"] = resultado["venta"]["Precio Total de Lista"].to_numpy()
+        df.loc[validas, "precio_total_venta"] = resultado["venta"]["Precio Total con Descuento"].to_numpy()
+
+    df["sin_precio"] = (~validas & ~con_error).astype(int)
+    df["errores"] = con_error.astype(int)
+    resumen = df.groupby("cotizacion", sort=False).agg(
+        lineas=("producto", "size"),
+        sin_precio=("sin_precio", "sum"),
+        errores=("errores", "sum"),
+        total_costo=("subtotal_costo", "sum"),
+        total_venta=("precio_total_venta", "sum"),
+    ).reset_index()
+    con_margen = (resumen["total_venta"] > 0) & (resumen["total_costo"] > 0)
+    resumen["utilidad"] = (resumen["total_venta"] - resumen["total_costo"]).where(con_margen)
+    resumen["margen"] = (resumen["utilidad"] / resumen["total_venta"] * 100).where(con_margen)
+
+    lineas = df[COLUMNAS_LINEAS].astype(object)
+    lineas = lineas.where(lineas.notna(), None)
+    resumen = resumen[COLUMNAS_RESUMEN].astype(object)
+    resumen = resumen.where(resumen.notna(), None)
+    return list(lineas.itertuples(index=False, name=None)), list(resumen.itertuples(index=False, name=None))
+
+
+class EscritorSalida:
+    def __init__(self, ruta, columnas):
+        self.columnas = columnas
+        self.jsonl = ruta.endswith(".jsonl")
+        self.archivo = sys.stdout if ruta == "-" else open(ruta, "w", newline="", encoding="utf-8")
+        if not self.jsonl:
+            self.csv = csv.writer(self.archivo)
+            self.csv.writerow(columnas)
+
+    def escribir(self, filas):
+        if self.jsonl:
+            self.archivo.writelines(json.dumps(dict(zip(self.columnas, fila)), ensure_ascii=False) + "\n"
+                                    for fila in filas)
+        else:
+            self.csv.writerows(filas)
+
+    def cerrar(self):
+        if self.archivo is sys.stdout:
+            self.archivo.flush()
+        else:
+            self.archivo.close()
+
+
+def cotizar_archivo(entrada, salida, ruta_resumen=None, procesos=None, tamano_bloque=5000,
+                    ruta_excel=RUTA_EXCEL, ruta_catalogo=RUTA_CATALOGO):
+    procesos = procesos or os.cpu_count() or 1
+    # Compila el catálogo en el proceso principal para que los trabajadores sólo lo lean
+    cargar_catalogo(ruta_excel, ruta_catalogo)
+
+    escritor = EscritorSalida(salida, COLUMNAS_LINEAS)
+    escritor_resumen = EscritorSalida(ruta_resumen, COLUMNAS_RESUMEN) if ruta_resumen else None
+    total_lineas = 0
+    total_cotizaciones = 0
+    total_errores = 0
+    inicio = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador,
+                             initargs=(ruta_excel, ruta_catalogo)) as pool:
+        # Se limita el número de bloques en vuelo y se escriben en el orden de entrada
+        pendientes = deque()
+
+        def escribir_siguiente():
+            nonlocal total_lineas, total_cotizaciones, total_errores
+            lineas, resumen = pendientes.popleft().result()
+            escritor.escribir(lineas)
+            if escritor_resumen:
+                escritor_resumen.escribir(resumen)
+            total_lineas += len(lineas)
+            total_cotizaciones += len(resumen)
+            total_errores += sum(fila[ERRORES] for fila in resumen)
+
+        for bloque in agrupar_en_bloques(leer_lineas(entrada), tamano_bloque):
+            pendientes.append(pool.submit(cotizar_bloque, bloque))
+            if len(pendientes) >= procesos * 2:
+                escribir_siguiente()
+        while pendientes:
+            escribir_siguiente()
+
+    escritor.cerrar()
+    if escritor_resumen:
+        escritor_resumen.cerrar()
+    return total_lineas, total_cotizaciones, total_errores, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cotiza en lote canastas de productos (CSV o JSONL) con el catálogo de precios del cotizador."
+    )
+    parser.add_argument("entrada", help="Archivo .csv o .jsonl con columnas: " + ", ".join(COLUMNAS_ENTRADA))
+    parser.add_argument("salida", help="Archivo .csv o .jsonl con el resultado por línea ('-' para stdout)")
+    parser.add_argument("--resumen", help="Archivo .csv o .jsonl con totales, utilidad y margen por cotización")
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--bloque", type=int, default=5000, help="Líneas por bloque enviado a cada proceso")
+    parser.add_argument("--excel", default=RUTA_EXCEL)
+    parser.add_argument("--catalogo", default=RUTA_CATALOGO)
+    args = parser.parse_args()
+
+    lineas, cotizaciones, errores, segundos = cotizar_archivo(
+        args.entrada, args.salida, args.resumen, args.procesos, args.bloque, args.excel, args.catalogo
+    )
+    print(f"✅ {lineas:,} líneas ({cotizaciones:,} cotizaciones) en {segundos:.2f}s "
+          f"— {lineas / max(segundos, 1e-9):,.0f} líneas/s", file=sys.stderr)
+    if errores:
+        print(f"⚠️ {errores:,} líneas con error (estado 'error'; el motivo está en la columna 'motivo')",
+              file=sys.stderr)
@@ -1,18 +1,144 @@
 import sqlite3
 import os
+import re
+import threading
+
+from metricas import METRICAS_ACTIVAS, tramo
+from rfc import normalizar_rfc
+
+# Definición global de la base de datos (una sola ruta para todos los módulos).
+# Se puede cambiar con la variable de entorno CRM_DB_PATH.
+DB_PATH = os.environ.get("CRM_DB_PATH", os.path.join(os.getcwd(), "crm_cotizaciones.sqlite"))
+
+# Conexiones ociosas que se conservan abiertas para reutilizarlas
+TAMANO_POOL = 8
+
+PRAGMAS_CONEXION = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+_pool = []
+_pool_lock = threading.Lock()
+_pool_pid = os.getpid()
+
+
+class ConexionPool(sqlite3.Connection):
+    """
+    Conexión del pool compartido: `close()` la devuelve al pool en lugar de cerrarla,
+    así el código existente (conectar, consultar, cerrar) no necesita cambios.
+    """
+
+    def close(self):
+        if getattr(self, "_en_pool", False):
+            return
+        if self.in_transaction:
+            # Lo que no se confirmó con commit() se descarta, igual que al cerrar la conexión
+            self.rollback()
+        with _pool_lock:
+            if os.getpid() == _pool_pid and len(_pool) < TAMANO_POOL:
+                self._en_pool = True
+                _pool.append(self)
+                return
+        self.cerrar_definitivamente()
+
+    def cerrar_definitivamente(self):
+        # Actualiza las estadísticas del planificador de las tablas que esta conexión consultó y que cambiaron
+        try:
+            self.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+        super().close()
+
+
+def _tramo_sql(sql):
+    # Un tramo por tipo de sentencia (sqlite_select, sqlite_insert, ...) para no crear uno por consulta
+    palabra = sql.lstrip().split(None, 1)[0].lower() if sql and sql.strip() else "vacia"
+    return tramo(f"sqlite_{palabra}")
+
+
+class CursorMedido(sqlite3.Cursor):
+    # pandas (read_sql_query) consulta a través de cursores
+    def execute(self, sql, parametros=()):
+        with _tramo_sql(sql):
+            return super().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        with _tramo_sql(sql):
+            return super().executemany(sql, parametros)
+
+
+class ConexionPoolMedida(ConexionPool):
+    """ConexionPool que mide cada sentencia; sólo se usa con las métricas activas (CRM_METRICAS=1)."""
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        with _tramo_sql(sql):
+            return super().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        with _tramo_sql(sql):
+            return super().executemany(sql, parametros)
+
+
+def _nueva_conexion():
+    conn = sqlite3.connect(
+        DB_PATH, timeout=30, factory=ConexionPoolMedida if METRICAS_ACTIVAS else ConexionPool,
+        check_same_thread=False, cached_statements=256,
+    )
+    for pragma in PRAGMAS_CONEXION:
+        conn.execute(pragma)
+    return conn
 
-# Definición global de la base de datos
-DB_PATH = "crm_cotizaciones.sqlite"
 
 def conectar_db():
-    return sqlite3.connect(DB_PATH)
+    """
+    Toma una conexión ociosa del pool o abre una nueva. Cada hilo (sesión de Streamlit)
+    usa la conexión en exclusiva hasta llamar a `close()`.
+    """
+    global _pool_pid
+    with _pool_lock:
+        if os.getpid() != _pool_pid:
+            # Proceso hijo (fork): las conexiones heredadas no se pueden compartir
+            _pool.clear()
+            _pool_pid = os.getpid()
+        conn = _pool.pop() if _pool else None
+    if conn is None:
+        return _nueva_conexion()
+    conn._en_pool = False
+    return conn
 
-def inicializar_db():
-    conn = conectar_db()
-    cursor = conn.cursor()
 
+def cerrar_pool():
+    with _pool_lock:
+        conexiones = list(_pool)
+        _pool.clear()
+    for conn in conexiones:
+        conn.cerrar_definitivamente()
+
+# ========================
+# Migraciones del esquema
+# ========================
+# Cada migración corre una sola vez; la versión aplicada se guarda en PRAGMA user_version.
+# Para cambiar el esquema se agrega una función nueva al final de MIGRACIONES, nunca se edita una anterior.
+
+def _columnas(conn, tabla):
+    return {col[1] for col in conn.execute(f"PRAGMA table_info({tabla})").fetchall()}
+
+def _agregar_columnas(conn, tabla, columnas):
+    existentes = _columnas(conn, tabla)
+    for nombre, tipo in columnas:
+        if nombre not in existentes:
+            conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo}")
+
+def _migracion_001_esquema_base(conn):
     # Tabla de empresas
-    cursor.execute("""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS empresas (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             razon_social TEXT,
@@ -29,7 +155,7 @@ def inicializar_db():
     """)
 
     # Tabla de contactos (clientes)
-    cursor.execute("""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS contactos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             nombre TEXT,
@@ -42,8 +168,30 @@ def inicializar_db():
         )
     """)
 
+    # Tabla de clientes del módulo anterior (clientes_module.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT,
+            apellido_paterno TEXT,
+            apellido_materno TEXT,
+            empresa TEXT,
+            correo TEXT,
+            telefono TEXT,
+            rfc TEXT,
+            calle TEXT,
+            numero_exterior TEXT,
+            numero_interior TEXT,
+            codigo_postal TEXT,
+            municipio TEXT,
+            ciudad TEXT,
+            estado TEXT,
+            notas TEXT
+        )
+    """)
+
     # Tabla de usuarios
-    cursor.execute("""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS usuarios (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             nombre TEXT,
@@ -55,10 +203,13 @@ def inicializar_db():
         )
     """)
 
-    # Tabla de cotizaciones
-    cursor.execute("""
+    # Tabla de cotizaciones: une las columnas de texto libre del cotizador (cliente, contacto)
+    # con las referencias al CRM (empresa_id, contacto_id, usuario_id)
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS cotizaciones (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente TEXT,
+            contacto TEXT,
             empresa_id INTEGER,
             contacto_id INTEGER,
             propuesta TEXT,
@@ -76,9 +227,19 @@ def inicializar_db():
             FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
         )
     """)
+    # Bases creadas por versiones anteriores con sólo una parte de las columnas
+    _agregar_columnas(conn, "cotizaciones", [
+        ("cliente", "TEXT"),
+        ("contacto", "TEXT"),
+        ("empresa_id", "INTEGER REFERENCES empresas(id)"),
+        ("contacto_id", "INTEGER REFERENCES contactos(id)"),
+        ("vigencia", "TEXT"),
+        ("condiciones_comerciales", "TEXT"),
+        ("usuario_id", "INTEGER REFERENCES usuarios(id)"),
+    ])
 
     # Tabla de productos relacionados a cotización
-    cursor.execute("""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS detalle_productos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             cotizacion_id INTEGER,
@@ -92,5 +253,340 @@ def inicializar_db():
         )
     """)
 
+def _migracion_002_indices(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detalle_cotizacion ON detalle_productos(cotizacion_id, tipo_origen)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cotizaciones_fecha ON cotizaciones(fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cotizaciones_usuario ON cotizaciones(usuario_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_admin ON usuarios(admin_id)")
+
+# Agregado de ventas por usuario, cliente y mes ('AAAA-MM'); lo mantienen los triggers
+# de cotizaciones, así cualquier forma de escribir (formulario, importación masiva) queda reflejada.
+# Los valores nulos se guardan como 0 / '' para que formen parte de la llave.
+SQL_LLAVE_RESUMEN = "COALESCE({t}.usuario_id, 0), COALESCE({t}.cliente, ''), COALESCE(substr({t}.fecha, 1, 7), '')"
+
+# Recalcula el resumen completo desde cotizaciones (migración, reconstrucción y verificación)
+SQL_AGREGAR_RESUMEN = f"""
+    SELECT {SQL_LLAVE_RESUMEN.format(t="c")}, COUNT(*),
+           COALESCE(SUM(c.total_venta), 0), COALESCE(SUM(c.total_costo), 0), COALESCE(SUM(c.utilidad), 0)
+    FROM cotizaciones c
+    GROUP BY 1, 2, 3
+"""
+
+SQL_RECONSTRUIR_RESUMEN = f"""
+    INSERT INTO resumen_ventas (usuario_id, cliente, mes, cotizaciones, total_venta, total_costo, utilidad)
+    {SQL_AGREGAR_RESUMEN}
+"""
+
+def _migracion_003_resumen_ventas(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_ventas (
+            usuario_id INTEGER NOT NULL,
+            cliente TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            cotizaciones INTEGER NOT NULL DEFAULT 0,
+            total_venta REAL NOT NULL DEFAULT 0,
+            total_costo REAL NOT NULL DEFAULT 0,
+            utilidad REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_id, cliente, mes)
+        ) WITHOUT ROWID
+    """)
+
+    sumar = """
+        INSERT INTO resumen_ventas (usuario_id, cliente, mes, cotizaciones, total_venta, total_costo, utilidad)
+        VALUES ({llave}, 1, COALESCE(NEW.total_venta, 0), COALESCE(NEW.total_costo, 0), COALESCE(NEW.utilidad, 0))
+        ON CONFLICT (usuario_id, cliente, mes) DO UPDATE SET
+            cotizaciones = cotizaciones + 1,
+            total_venta = total_venta + excluded.total_venta,
+            total_costo = total_costo + excluded.total_costo,
+            utilidad = utilidad + excluded.utilidad;
+    """.format(llave=SQL_LLAVE_RESUMEN.format(t="NEW"))
+    restar = """
+        UPDATE resumen_ventas SET
+            cotizaciones = cotizaciones - 1,
+            total_venta = total_venta - COALESCE(OLD.total_venta, 0),
+            total_costo = total_costo - COALESCE(OLD.total_costo, 0),
+            utilidad = utilidad - COALESCE(OLD.utilidad, 0)
+        WHERE (usuario_id, cliente, mes) = ({llave});
+        DELETE FROM resumen_ventas WHERE (usuario_id, cliente, mes) = ({llave}) AND cotizaciones <= 0;
+    """.format(llave=SQL_LLAVE_RESUMEN.format(t="OLD"))
+
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_resumen_ventas_insert AFTER INSERT ON cotizaciones BEGIN {sumar} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_resumen_ventas_delete AFTER DELETE ON cotizaciones BEGIN {restar} END")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_resumen_ventas_update
+        AFTER UPDATE OF usuario_id, cliente, fecha, total_venta, total_costo, utilidad ON cotizaciones
+        BEGIN {restar} {sumar} END
+    """)
+
+    conn.execute("DELETE FROM resumen_ventas")
+    conn.execute(SQL_RECONSTRUIR_RESUMEN)
+
+def _migracion_004_jerarquia_usuarios(conn):
+    # Tabla de cierre de usuarios.admin_id: una fila por cada par (superior, subordinado) a cualquier
+    # profundidad, incluido el propio usuario con profundidad 0. Ver el equipo completo de un admin
+    # (con revendedores de varios niveles) es una búsqueda por ancestro_id.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios_jerarquia (
+            ancestro_id INTEGER NOT NULL,
+            descendiente_id INTEGER NOT NULL,
+            profundidad INTEGER NOT NULL,
+            PRIMARY KEY (ancestro_id, descendiente_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jerarquia_descendiente ON usuarios_jerarquia(descendiente_id)")
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jerarquia_insert AFTER INSERT ON usuarios
+        BEGIN
+            INSERT INTO usuarios_jerarquia (ancestro_id, descendiente_id, profundidad)
+            VALUES (NEW.id, NEW.id, 0);
+            INSERT INTO usuarios_jerarquia (ancestro_id, descendiente_id, profundidad)
+            SELECT ancestro_id, NEW.id, profundidad + 1
+            FROM usuarios_jerarquia WHERE descendiente_id = NEW.admin_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jerarquia_ciclo BEFORE UPDATE OF admin_id ON usuarios
+        WHEN EXISTS (
+            SELECT 1 FROM usuarios_jerarquia WHERE ancestro_id = NEW.id AND descendiente_id = NEW.admin_id
+        )
+        BEGIN
+            SELECT RAISE(ABORT, 'Un usuario no puede depender de sí mismo ni de alguien de su equipo');
+        END
+    """)
+    # Al cambiar de admin se mueve el subárbol completo: se cortan las rutas desde los superiores
+    # anteriores y se conectan con los nuevos
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jerarquia_update AFTER UPDATE OF admin_id ON usuarios
+        WHEN OLD.admin_id IS NOT NEW.admin_id
+        BEGIN
+            DELETE FROM usuarios_jerarquia
+            WHERE descendiente_id IN (SELECT descendiente_id FROM usuarios_jerarquia WHERE ancestro_id = NEW.id)
+              AND ancestro_id IN (SELECT ancestro_id FROM usuarios_jerarquia
+                                  WHERE descendiente_id = NEW.id AND ancestro_id <> NEW.id);
+            INSERT INTO usuarios_jerarquia (ancestro_id, descendiente_id, profundidad)
+            SELECT sup.ancestro_id, sub.descendiente_id, sup.profundidad + sub.profundidad + 1
+            FROM usuarios_jerarquia sup, usuarios_jerarquia sub
+            WHERE sup.descendiente_id = NEW.admin_id AND sub.ancestro_id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jerarquia_delete AFTER DELETE ON usuarios
+        BEGIN
+            DELETE FROM usuarios_jerarquia
+            WHERE ancestro_id IN (SELECT ancestro_id FROM usuarios_jerarquia WHERE descendiente_id = OLD.id)
+              AND descendiente_id IN (SELECT descendiente_id FROM usuarios_jerarquia WHERE ancestro_id = OLD.id);
+        END
+    """)
+
+    conn.execute("DELETE FROM usuarios_jerarquia")
+    conn.execute("""
+        WITH RECURSIVE arbol (ancestro_id, descendiente_id, profundidad) AS (
+            SELECT id, id, 0 FROM usuarios
+            UNION ALL
+            SELECT a.ancestro_id, u.id, a.profundidad + 1
+            FROM arbol a JOIN usuarios u ON u.admin_id = a.descendiente_id
+            WHERE a.profundidad < 64
+        )
+        INSERT OR IGNORE INTO usuarios_jerarquia (ancestro_id, descendiente_id, profundidad)
+        SELECT ancestro_id, descendiente_id, MIN(profundidad) FROM arbol GROUP BY ancestro_id, descendiente_id
+    """)
+
+# Índices de texto completo: {tabla: columnas indexadas}. Cada tabla FTS5 es "external content":
+# guarda sólo el índice y lee el texto de la tabla original por rowid = id
+COLUMNAS_BUSQUEDA = {
+    "empresas": ["razon_social", "rfc", "ciudad", "municipio", "estado"],
+    "contactos": ["nombre", "apellido_paterno", "apellido_materno", "correo"],
+    "clientes": ["nombre", "apellido_paterno", "apellido_materno", "empresa", "correo", "rfc", "ciudad"],
+}
+
+def _crear_triggers_fts(conn, tabla, columnas, condicion=""):
+    fts = f"{tabla}_fts"
+    lista = ", ".join(columnas)
+    nuevos = ", ".join(f"NEW.{c}" for c in columnas)
+    viejos = ", ".join(f"OLD.{c}" for c in columnas)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {tabla} {condicion}
+        BEGIN
+            INSERT INTO {fts} (rowid, {lista}) VALUES (NEW.id, {nuevos});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {tabla} {condicion}
+        BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', OLD.id, {viejos});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE ON {tabla} {condicion}
+        BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', OLD.id, {viejos});
+            INSERT INTO {fts} (rowid, {lista}) VALUES (NEW.id, {nuevos});
+        END
+    """)
+
+def _migracion_005_busqueda_fts(conn):
+    for tabla, columnas in COLUMNAS_BUSQUEDA.items():
+        fts = f"{tabla}_fts"
+        # remove_diacritics: "Querétaro" y "queretaro" son el mismo término; prefix acelera las búsquedas por prefijo
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {", ".join(columnas)}, content='{tabla}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """)
+        _crear_triggers_fts(conn, tabla, columnas)
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def _migracion_006_indice_razon_social(conn):
+    # Búsqueda por prefijo sin distinguir mayúsculas (selector de empresa) y listas ordenadas por nombre
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_empresas_razon_social ON empresas(razon_social COLLATE NOCASE)")
+
+def _migracion_007_rfc_normalizado(conn):
+    # Llave de deduplicación de empresas. Si ya hay RFC repetidos, sólo la empresa más antigua
+    # de cada RFC recibe la llave; las demás quedan para revisarse y fusionarse a mano
+    _agregar_columnas(conn, "empresas", [("rfc_normalizado", "TEXT")])
+    conn.create_function("normalizar_rfc", 1, normalizar_rfc, deterministic=True)
+    conn.execute("""
+        UPDATE empresas SET rfc_normalizado = normalizar_rfc(rfc)
+        WHERE id IN (
+            SELECT MIN(id) FROM empresas
+            WHERE normalizar_rfc(rfc) IS NOT NULL
+            GROUP BY normalizar_rfc(rfc)
+        )
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_empresas_rfc_normalizado
+        ON empresas(rfc_normalizado) WHERE rfc_normalizado IS NOT NULL
+    """)
+
+def _migracion_008_fts_pausable(conn):
+    # Las cargas masivas indexan por bloque (ver pausar_fts) en lugar de fila por fila desde los triggers
+    conn.execute("CREATE TABLE IF NOT EXISTS fts_pausa (tabla TEXT PRIMARY KEY) WITHOUT ROWID")
+    for tabla, columnas in COLUMNAS_BUSQUEDA.items():
+        for evento in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{tabla}_fts_{evento}")
+        _crear_triggers_fts(
+            conn, tabla, columnas,
+            condicion=f"WHEN NOT EXISTS (SELECT 1 FROM fts_pausa WHERE tabla = '{tabla}')",
+        )
+
+def _migracion_009_indices_empresa(conn):
+    # Contactos y cotizaciones de una empresa (fusión de duplicados)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_contactos_empresa ON contactos(empresa_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cotizaciones_empresa ON cotizaciones(empresa_id)")
+
+def pausar_fts(conn, tabla):
+    """
+    Desactiva los triggers FTS de `tabla` dentro de la transacción abierta en `conn`. Como la marca
+    nunca se confirma (reanudar_fts la borra antes del commit), los demás procesos no la ven.
+    Quien pausa debe mantener el índice con borrar_fts / indexar_fts.
+    """
+    conn.execute("INSERT OR IGNORE INTO fts_pausa (tabla) VALUES (?)", (tabla,))
+
+def reanudar_fts(conn, tabla):
+    conn.execute("DELETE FROM fts_pausa WHERE tabla = ?", (tabla,))
+
+def borrar_fts(conn, tabla, where, parametros=()):
+    """Quita del índice FTS las filas de `tabla` que cumplen `where` (llamar antes de modificarlas)."""
+    columnas = ", ".join(COLUMNAS_BUSQUEDA[tabla])
+    conn.execute(f"""
+        INSERT INTO {tabla}_fts ({tabla}_fts, rowid, {columnas})
+        SELECT 'delete', id, {columnas} FROM {tabla} WHERE {where}
+    """, parametros)
+
+def indexar_fts(conn, tabla, where, parametros=()):
+    """Agrega al índice FTS, en una sola sentencia, las filas de `tabla` que cumplen `where`."""
+    columnas = ", ".join(COLUMNAS_BUSQUEDA[tabla])
+    conn.execute(f"""
+        INSERT INTO {tabla}_fts (rowid, {columnas})
+        SELECT id, {columnas} FROM {tabla} WHERE {where}
+    """, parametros)
+
+def expresion_fts(texto):
+    """
+    Convierte lo que escribe el usuario en una consulta FTS5: cada palabra como prefijo y todas
+    requeridas. Las comillas evitan que la puntuación o palabras como NOT se lean como operadores.
+    """
+    return " ".join(f'"{palabra}"*' for palabra in re.findall(r"\w+", texto or ""))
+
+MIGRACIONES = [
+    _migracion_001_esquema_base,
+    _migracion_002_indices,
+    _migracion_003_resumen_ventas,
+    _migracion_004_jerarquia_usuarios,
+    _migracion_005_busqueda_fts,
+    _migracion_006_indice_razon_social,
+    _migracion_007_rfc_normalizado,
+    _migracion_008_fts_pausable,
+    _migracion_009_indices_empresa,
+]
+
+def aplicar_migraciones(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(MIGRACIONES):
+        return version
+    for numero, migracion in enumerate(MIGRACIONES, start=1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Se vuelve a leer con el candado tomado por si otro proceso migró mientras tanto
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if numero > version:
+                migracion(conn)
+                conn.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(MIGRACIONES)
+
+# Una tabla se vuelve a analizar cuando su tamaño cambió este factor desde el último ANALYZE
+FACTOR_ESTADISTICAS = 10
+
+def actualizar_estadisticas(conn):
+    """
+    Recalcula las estadísticas del planificador (sqlite_stat1) de las tablas que crecieron o se
+    redujeron mucho desde el último ANALYZE. Con estadísticas tomadas cuando la base era pequeña
+    SQLite deja de usar los índices de las consultas frecuentes.
+    """
+    # ANALYZE aproximado: revisa a lo más ~400 filas por índice, tarda lo mismo con 1k o con 1M filas
+    conn.execute("PRAGMA analysis_limit = 400")
+    if sqlite3.sqlite_version_info >= (3, 46, 0):
+        conn.execute("PRAGMA optimize=0x10002")
+        return
+    # Antes de 3.46 PRAGMA optimize sólo revisa las tablas que ya consultó la conexión: mismo criterio a mano
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        return
+    for tabla, filas_stat in conn.execute(
+        "SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl"
+    ).fetchall():
+        existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+        if not existe:
+            continue
+        filas = conn.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+        if max(filas, 1) >= FACTOR_ESTADISTICAS * max(filas_stat, 1) or \
+                max(filas_stat, 1) >= FACTOR_ESTADISTICAS * max(filas, 1):
+            conn.execute(f'ANALYZE "{tabla}"')
     conn.commit()
-    conn.close()
+
+# Las migraciones se revisan una vez por proceso; las llamadas siguientes no tocan la base
+_db_inicializada = False
+
+def inicializar_db():
+    global _db_inicializada
+    if _db_inicializada:
+        return
+    conn = conectar_db()
+    try:
+        aplicar_migraciones(conn)
+        actualizar_estadisticas(conn)
+    finally:
+        conn.close()
+    _db_inicializada = True
+
+def usar_base(ruta):
+    """Cambia la base de este proceso (herramientas como benchmark.py); cierra las conexiones del pool."""
+    global DB_PATH, _db_inicializada
+    cerrar_pool()
+    DB_PATH = ruta
+    _db_inicializada = False
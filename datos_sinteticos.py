@@ -0,0 +1,228 @@
+# datos_sinteticos.py
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from catalogo import COLUMNAS_TEXTO, COLUMNAS_NUMERICAS, construir_indice_tiers
+from database import conectar_db, inicializar_db, pausar_fts, reanudar_fts, indexar_fts
+from cotizaciones import importar_cotizaciones
+
+# Mismos cortes de tiers que el catálogo real
+TIERS = ((1, 24), (25, 49), (50, 99), (100, 249), (250, 499), (500, 999))
+TERMINOS = (12, 24, 36)
+FAMILIAS = ("Endpoint Protection", "Endpoint Detection and Response", "Managed Detection and Response",
+            "Vulnerability Management", "Patch Management", "DNS Filtering", "Mobile Security",
+            "Email Security", "Server Protection", "Incident Response")
+# Tamaños de base para benchmark.py
+ESCALAS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+PALABRAS_EMPRESA = ("Grupo", "Servicios", "Tecnología", "Comercializadora", "Industrias", "Consultores",
+                    "Norte", "Pacífico", "Bajío", "Integral", "Digital", "Logística", "Médica", "Financiera")
+SOCIEDADES = ("S.A. de C.V.", "S. de R.L. de C.V.", "S.C.", "S.A.P.I. de C.V.")
+ESTADOS = ("Ciudad de México", "Jalisco", "Nuevo León", "Puebla", "Querétaro", "Yucatán", "Sonora", "Veracruz")
+NOMBRES = ("Ana", "Luis", "María", "José", "Carmen", "Jorge", "Laura", "Miguel", "Sofía", "Ricardo")
+APELLIDOS = ("García", "Hernández", "López", "Martínez", "González", "Pérez", "Rodríguez", "Sánchez", "Ramírez")
+
+
+def catalogo_sintetico(productos=20, terminos=TERMINOS, tiers=TIERS, semilla=0):
+    """Catálogo con las columnas de cargar_catalogo: `productos` × plazos × tiers, con precio decreciente por tier."""
+    rng = random.Random(semilla)
+    filas = []
+    for p in range(productos):
+        titulo = f"ThreatDown\n{FAMILIAS[p % len(FAMILIAS)]} {p // len(FAMILIAS) + 1}"
+        sku = f"SYN-{p:04d}"
+        base = rng.uniform(20, 400)
+        for termino in terminos:
+            precio = base * termino / 12
+            for tier_min, tier_max in tiers:
+                filas.append((f"{sku}-{termino}-{tier_min}", sku, titulo, termino, float(tier_min),
+                              float(tier_max), round(precio, 2)))
+                precio *= rng.uniform(0.88, 0.97)
+    return pd.DataFrame(filas, columns=COLUMNAS_TEXTO + COLUMNAS_NUMERICAS)
+
+
+def _rfc(rng, numero):
+    # Tres letras, fecha AAMMDD y homoclave; el número hace único cada RFC
+    letras = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3))
+    return f"{letras}{numero % 1_000_000:06d}{numero // 1_000_000 % 10}{rng.choice('ABCDEFGHJKLMN')}{rng.randint(1, 9)}"
+
+
+def empresas_sinteticas(n, semilla=0):
+    """Genera (razon_social, rfc, calle, numero_exterior, numero_interior, codigo_postal, municipio, ciudad, estado, notas)."""
+    rng = random.Random(semilla)
+    for i in range(n):
+        nombre = " ".join(rng.sample(PALABRAS_EMPRESA, 2))
+        estado = rng.choice(ESTADOS)
+        yield (f"{nombre} {i:06d} {rng.choice(SOCIEDADES)}", _rfc(rng, i), f"Calle {rng.randint(1, 300)}",
+               str(rng.randint(1, 9999)), "", f"{rng.randint(1000, 99999):05d}", estado, estado, estado, "")
+
+
+def cotizaciones_sinteticas(n, catalogo, semilla=0, clientes=None, usuarios=(None,), max_partidas=8,
+                            fecha_inicio=date(2021, 1, 1), dias=1460):
+    """
+    Genera `n` tuplas (datos, productos_venta, productos_costo) con el formato de guardar_cotizacion,
+    con precios tomados de `catalogo` y descuentos al azar. Misma semilla, mismas cotizaciones.
+    """
+    rng = random.Random(semilla)
+    indice = construir_indice_tiers(catalogo)
+    productos_por_termino = {}
+    for termino, producto in indice:
+        productos_por_termino.setdefault(termino, []).append(producto)
+    terminos = sorted(productos_por_termino)
+    clientes = clientes or [f"Cliente {i:05d}" for i in range(max(n // 20, 10))]
+
+    for i in range(n):
+        termino = rng.choice(terminos)
+        venta = []
+        costo = []
+        for _ in range(rng.randint(1, max_partidas)):
+            producto = rng.choice(productos_por_termino[termino])
+            minimos, maximos, precios = indice[(termino, producto)]
+            # Los tiers bajos son los más comunes
+            t = min(int(rng.expovariate(0.8)), len(minimos) - 1)
+            cantidad = rng.randint(int(minimos[t]), int(maximos[t]))
+            precio = float(precios[t])
+            item_disc = rng.choice((0, 0, 5, 10, 15))
+            canal = rng.choice((0, 5, 10)) + rng.choice((0, 0, 5))
+            descuento = rng.choice((0, 0, 5, 10, 15, 20))
+            unitario_costo = precio * (1 - item_disc / 100) * (1 - canal / 100)
+            venta.append({
+                "Producto": producto, "Cantidad": cantidad, "Precio Unitario de Lista": precio,
+                "Precio Total con Descuento": round(precio * cantidad * (1 - descuento / 100), 2),
+                "Descuento %": float(descuento),
+            })
+            costo.append({
+                "Producto": producto, "Cantidad": cantidad, "Precio Base": precio,
+                "Subtotal": round(unitario_costo * cantidad, 2), "Item Disc. %": float(item_disc),
+            })
+        total_venta = round(sum(p["Precio Total con Descuento"] for p in venta), 2)
+        total_costo = round(sum(p["Subtotal"] for p in costo), 2)
+        utilidad = total_venta - total_costo
+        cliente = rng.choice(clientes)
+        datos = {
+            "cliente": cliente, "contacto": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+            "propuesta": f"Propuesta {i + 1:07d} {termino} meses",
+            "fecha": (fecha_inicio + timedelta(days=rng.randrange(dias))).strftime("%Y-%m-%d"),
+            "responsable": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+            "total_venta": total_venta, "total_costo": total_costo, "utilidad": utilidad,
+            "margen": utilidad / total_venta * 100 if total_venta > 0 else None,
+            "vigencia": "30 días", "condiciones_comerciales": "Precios en USD. No incluye impuestos.",
+            "usuario_id": rng.choice(usuarios),
+        }
+        yield datos, venta, costo
+
+
+def _crear_usuarios(conn, admins, vendedores, rng):
+    # Un superadmin, `admins` admins y los vendedores repartidos entre ellos; la tabla de cierre la llenan los triggers
+    conn.execute(
+        "INSERT INTO usuarios (nombre, correo, contraseña, tipo_usuario, admin_id) VALUES (?, ?, '', ?, NULL)",
+        ("Superadmin", "superadmin@sintetico.test", "superadmin"),
+    )
+    ids_admin = [
+        conn.execute(
+            "INSERT INTO usuarios (nombre, correo, contraseña, tipo_usuario, admin_id) VALUES (?, ?, '', 'admin', NULL)",
+            (f"Admin {a}", f"admin{a}@sintetico.test"),
+        ).lastrowid
+        for a in range(admins)
+    ]
+    return ids_admin, [
+        conn.execute(
+            "INSERT INTO usuarios (nombre, correo, contraseña, tipo_usuario, admin_id) VALUES (?, ?, '', 'vendedor', ?)",
+            (f"Vendedor {v}", f"vendedor{v}@sintetico.test", rng.choice(ids_admin)),
+        ).lastrowid
+        for v in range(vendedores)
+    ]
+
+
+def poblar_crm(cotizaciones, catalogo=None, semilla=0, empresas=None, admins=5, vendedores=50, progreso=None):
+    """
+    Llena la base actual (normalmente vacía, ver database.usar_base) con usuarios, empresas con dos
+    contactos cada una y `cotizaciones` cotizaciones sobre esas empresas.
+    Regresa un dict con lo insertado y los segundos que tomó.
+    """
+    inicio = time.perf_counter()
+    rng = random.Random(semilla)
+    catalogo = catalogo if catalogo is not None else catalogo_sintetico(semilla=semilla)
+    empresas = empresas if empresas is not None else max(cotizaciones // 20, 10)
+    inicializar_db()
+
+    conn = conectar_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _, ids_vendedor = _crear_usuarios(conn, admins, vendedores, rng)
+            # Igual que importar_crm: el índice de búsqueda se llena al final en una sola pasada
+            pausar_fts(conn, "empresas")
+            pausar_fts(conn, "contactos")
+            ultima_empresa = conn.execute("SELECT COALESCE(MAX(id), 0) FROM empresas").fetchone()[0]
+            ultimo_contacto = conn.execute("SELECT COALESCE(MAX(id), 0) FROM contactos").fetchone()[0]
+            nombres = []
+            for fila in empresas_sinteticas(empresas, semilla):
+                empresa_id = conn.execute(
+                    "INSERT INTO empresas (razon_social, rfc, calle, numero_exterior, numero_interior, codigo_postal, "
+                    "municipio, ciudad, estado, notas, rfc_normalizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    fila + (fila[1],),
+                ).lastrowid
+                nombres.append(fila[0])
+                conn.executemany(
+                    "INSERT INTO contactos (nombre, apellido_paterno, apellido_materno, correo, telefono, empresa_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(rng.choice(NOMBRES), rng.choice(APELLIDOS), rng.choice(APELLIDOS),
+                      f"contacto{empresa_id}_{c}@sintetico.test", f"55{rng.randint(10**7, 10**8 - 1)}", empresa_id)
+                     for c in range(2)],
+                )
+            indexar_fts(conn, "empresas", "id > ?", (ultima_empresa,))
+            indexar_fts(conn, "contactos", "id > ?", (ultimo_contacto,))
+            reanudar_fts(conn, "empresas")
+            reanudar_fts(conn, "contactos")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.close()
+
+    generador = cotizaciones_sinteticas(cotizaciones, catalogo, semilla, clientes=nombres, usuarios=ids_vendedor)
+    if progreso:
+        generador = _con_progreso(generador, progreso)
+    total_cotizaciones, total_partidas = importar_cotizaciones(generador, tamano_lote=5000)
+    return {
+        "usuarios": 1 + admins + vendedores,
+        "empresas": empresas,
+        "contactos": empresas * 2,
+        "cotizaciones": total_cotizaciones,
+        "partidas": total_partidas,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+
+def _con_progreso(generador, progreso, cada=10_000):
+    for i, cotizacion in enumerate(generador, start=1):
+        if i % cada == 0:
+            progreso(i)
+        yield cotizacion
+
+
+if __name__ == "__main__":
+    from database import usar_base
+
+    parser = argparse.ArgumentParser(description="Genera una base del CRM con datos sintéticos reproducibles.")
+    parser.add_argument("destino", help="Archivo .sqlite nuevo")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="1k", help="Número de cotizaciones")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--productos", type=int, default=20, help="Productos del catálogo sintético")
+    parser.add_argument("--catalogo", help="Además escribe el catálogo sintético a este .xlsx")
+    args = parser.parse_args()
+
+    catalogo = catalogo_sintetico(args.productos, semilla=args.semilla)
+    if args.catalogo:
+        catalogo.to_excel(args.catalogo, index=False)
+    usar_base(args.destino)
+    resultado = poblar_crm(ESCALAS[args.escala], catalogo, args.semilla,
+                           progreso=lambda n: print(f"\r{n:,} cotizaciones", end="", file=sys.stderr, flush=True))
+    print(file=sys.stderr)
+    print(f"✅ {resultado['cotizaciones']:,} cotizaciones, {resultado['partidas']:,} partidas y "
+          f"{resultado['empresas']:,} empresas en {args.destino} ({resultado['segundos']:.1f}s)", file=sys.stderr)
@@ -0,0 +1,228 @@
+# deduplicar.py
+import argparse
+import csv
+import re
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+
+from database import conectar_db, inicializar_db
+from cotizaciones import invalidar_detalle_cotizacion
+from rfc import normalizar_rfc
+
+# Palabras que no distinguen a una empresa de otra: tipo de sociedad y artículos
+PALABRAS_IGNORADAS = {
+    "sa", "sab", "sapi", "de", "cv", "s", "rl", "sc", "ac", "sas", "srl",
+    "y", "e", "la", "el", "los", "las", "del", "cia", "co", "inc", "ltd", "llc",
+}
+# Bloques con más registros que esto se descartan: la llave es demasiado común para servir
+MAX_TAMANO_BLOQUE = 50
+UMBRAL_SIMILITUD = 0.8
+CAMPOS_EMPRESA = [
+    "razon_social", "rfc", "calle", "numero_exterior", "numero_interior",
+    "codigo_postal", "municipio", "ciudad", "estado", "notas",
+]
+
+
+def normalizar_nombre(nombre):
+    """Razón social sin acentos, puntuación ni tipo de sociedad: 'Grupo Peñoles, S.A. de C.V.' -> 'grupo penoles'."""
+    texto = unicodedata.normalize("NFKD", str(nombre or "")).encode("ascii", "ignore").decode().lower()
+    # Los puntos se quitan antes de separar para que "S.A." sea "sa" y no "s", "a"
+    palabras = re.findall(r"[a-z0-9&]+", texto.replace(".", ""))
+    return " ".join(p for p in palabras if p not in PALABRAS_IGNORADAS)
+
+
+def trigramas(texto):
+    compacto = f"  {texto} "
+    return {compacto[i:i + 3] for i in range(len(compacto) - 2)}
+
+
+def similitud(a, b):
+    """Índice de Jaccard entre los trigramas de dos nombres normalizados (0 a 1)."""
+    ta, tb = trigramas(a), trigramas(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def llaves_bloque(nombre, rfc, codigo_postal):
+    """Llaves de bloqueo de un registro: sólo se comparan registros que comparten al menos una."""
+    llaves = []
+    if rfc:
+        llaves.append(("rfc", rfc))
+    if nombre:
+        palabras = nombre.split()
+        llaves.append(("nombre", nombre.replace(" ", "")))
+        # Pares de palabras consecutivas; las palabras sueltas sólo cuando son el nombre completo
+        llaves.extend(("palabras", f"{a} {b}") for a, b in zip(palabras, palabras[1:]))
+        if len(palabras) == 1:
+            llaves.append(("palabras", palabras[0]))
+        if codigo_postal:
+            llaves.append(("cp", f"{codigo_postal}:{palabras[0][:4]}"))
+    return llaves
+
+
+def leer_registros(incluir_clientes=True):
+    """Empresas (y clientes del módulo anterior) como (origen, id, nombre original, nombre normalizado, rfc, cp)."""
+    conn = conectar_db()
+    try:
+        consultas = [("empresa", "SELECT id, razon_social, rfc, codigo_postal FROM empresas")]
+        if incluir_clientes:
+            consultas.append(("cliente", "SELECT id, empresa, rfc, codigo_postal FROM clientes"))
+        registros = []
+        for origen, consulta in consultas:
+            for id_, nombre, rfc, cp in conn.execute(consulta):
+                registros.append((origen, id_, nombre, normalizar_nombre(nombre), normalizar_rfc(rfc),
+                                  (cp or "").strip()))
+        return registros
+    finally:
+        conn.close()
+
+
+def buscar_candidatos(registros, umbral=UMBRAL_SIMILITUD, max_tamano_bloque=MAX_TAMANO_BLOQUE):
+    """
+    Pares de registros probablemente duplicados. Sólo se comparan los registros que comparten una
+    llave de bloqueo (RFC, nombre compacto, pares de palabras, código postal + inicio del nombre),
+    así el costo crece con el tamaño de los bloques y no con n².
+    Regresa (candidatos [(i, j, similitud, motivo)] con i, j índices en `registros`, estadísticas).
+    """
+    bloques = defaultdict(list)
+    for indice, (_, _, _, nombre, rfc, cp) in enumerate(registros):
+        for llave in llaves_bloque(nombre, rfc, cp):
+            bloques[llave].append(indice)
+
+    comparados = set()
+    candidatos = []
+    descartados = 0
+    for (tipo, _), indices in bloques.items():
+        if len(indices) < 2:
+            continue
+        if len(indices) > max_tamano_bloque and tipo != "rfc":
+            descartados += 1
+            continue
+        for i, j in combinations(indices, 2):
+            if (i, j) in comparados:
+                continue
+            comparados.add((i, j))
+            a, b = registros[i], registros[j]
+            if a[4] and a[4] == b[4]:
+                candidatos.append((i, j, 1.0, "mismo RFC"))
+                continue
+            if a[4] and b[4]:
+                # RFC distintos: son empresas distintas aunque se llamen igual
+                continue
+            valor = similitud(a[3], b[3])
+            if valor >= umbral:
+                candidatos.append((i, j, round(valor, 3), "nombre similar"))
+
+    estadisticas = {
+        "registros": len(registros),
+        "bloques": len(bloques),
+        "bloques_descartados": descartados,
+        "comparaciones": len(comparados),
+        "candidatos": len(candidatos),
+    }
+    return candidatos, estadisticas
+
+
+def escribir_candidatos(ruta, registros, candidatos):
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["origen_a", "id_a", "nombre_a", "origen_b", "id_b", "nombre_b", "similitud", "motivo"])
+        for i, j, valor, motivo in sorted(candidatos, key=lambda c: -c[2]):
+            a, b = registros[i], registros[j]
+            escritor.writerow([a[0], a[1], a[2], b[0], b[1], b[2], valor, motivo])
+
+
+def fusionar_empresas(conservar_id, duplicadas_ids):
+    """
+    Fusiona las empresas `duplicadas_ids` en `conservar_id` en una sola transacción: sus contactos y
+    cotizaciones pasan a la empresa conservada, los campos vacíos de ésta se completan con los de las
+    duplicadas y las duplicadas se eliminan. Regresa (contactos movidos, cotizaciones movidas).
+    """
+    duplicadas_ids = [int(i) for i in duplicadas_ids if int(i) != int(conservar_id)]
+    if not duplicadas_ids:
+        raise ValueError("No hay empresas duplicadas que fusionar")
+    marcas = ", ".join("?" for _ in duplicadas_ids)
+
+    conn = conectar_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        columnas = ", ".join(["id", "rfc_normalizado"] + CAMPOS_EMPRESA)
+        filas = {fila[0]: fila for fila in conn.execute(
+            f"SELECT {columnas} FROM empresas WHERE id IN (?, {marcas})", [conservar_id] + duplicadas_ids
+        )}
+        faltantes = {int(conservar_id), *duplicadas_ids} - filas.keys()
+        if faltantes:
+            raise ValueError(f"No existen las empresas {sorted(faltantes)}")
+
+        contactos = conn.execute(
+            f"UPDATE contactos SET empresa_id = ? WHERE empresa_id IN ({marcas})", [conservar_id] + duplicadas_ids
+        ).rowcount
+        # BEGIN IMMEDIATE ya tiene el candado de escritura: nadie mueve cotizaciones entre el SELECT y el UPDATE
+        cotizaciones_ids = [id_ for (id_,) in conn.execute(
+            f"SELECT id FROM cotizaciones WHERE empresa_id IN ({marcas})", duplicadas_ids
+        )]
+        conn.execute(
+            f"UPDATE cotizaciones SET empresa_id = ? WHERE empresa_id IN ({marcas})", [conservar_id] + duplicadas_ids
+        )
+
+        # Campos vacíos de la conservada: el primer valor no vacío de las duplicadas, en orden de id
+        conservada = dict(zip(["id", "rfc_normalizado"] + CAMPOS_EMPRESA, filas[int(conservar_id)]))
+        completar = {}
+        for id_ in sorted(duplicadas_ids):
+            duplicada = dict(zip(["id", "rfc_normalizado"] + CAMPOS_EMPRESA, filas[id_]))
+            for campo in ["rfc_normalizado"] + CAMPOS_EMPRESA:
+                if not conservada[campo] and duplicada[campo] and campo not in completar:
+                    completar[campo] = duplicada[campo]
+
+        # Se borran antes de completar para liberar su rfc_normalizado (índice único)
+        conn.execute(f"DELETE FROM empresas WHERE id IN ({marcas})", duplicadas_ids)
+        if completar:
+            conn.execute(
+                f"UPDATE empresas SET {', '.join(f'{c} = ?' for c in completar)} WHERE id = ?",
+                list(completar.values()) + [conservar_id],
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    # Los detalles en caché de las cotizaciones movidas traen el empresa_id anterior
+    for cotizacion_id in cotizaciones_ids:
+        invalidar_detalle_cotizacion(cotizacion_id)
+    return contactos, len(cotizaciones_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detección y fusión de empresas duplicadas.")
+    sub = parser.add_subparsers(dest="accion", required=True)
+    p_candidatos = sub.add_parser("candidatos", help="Escribe en un CSV los pares probablemente duplicados")
+    p_candidatos.add_argument("salida", help="Archivo .csv de salida")
+    p_candidatos.add_argument("--umbral", type=float, default=UMBRAL_SIMILITUD,
+                              help="Similitud mínima de nombres (0 a 1)")
+    p_candidatos.add_argument("--sin-clientes", action="store_true",
+                              help="No incluir la tabla clientes del módulo anterior")
+    p_fusionar = sub.add_parser("fusionar", help="Fusiona empresas duplicadas en una")
+    p_fusionar.add_argument("conservar", type=int, help="id de la empresa que se conserva")
+    p_fusionar.add_argument("duplicadas", type=int, nargs="+", help="ids de las empresas que se eliminan")
+    args = parser.parse_args()
+
+    inicializar_db()
+    if args.accion == "candidatos":
+        inicio = time.perf_counter()
+        registros = leer_registros(incluir_clientes=not args.sin_clientes)
+        candidatos, estadisticas = buscar_candidatos(registros, args.umbral)
+        escribir_candidatos(args.salida, registros, candidatos)
+        print(f"✅ {estadisticas['candidatos']:,} candidatos en {args.salida} "
+              f"({estadisticas['registros']:,} registros, {estadisticas['comparaciones']:,} comparaciones, "
+              f"{estadisticas['bloques_descartados']:,} bloques descartados por grandes, "
+              f"{time.perf_counter() - inicio:.1f}s)", file=sys.stderr)
+    else:
+        contactos, cotizaciones = fusionar_empresas(args.conservar, args.duplicadas)
+        print(f"✅ Empresas {args.duplicadas} fusionadas en {args.conservar}: "
+              f"{contactos} contactos y {cotizaciones} cotizaciones reasignados", file=sys.stderr)
@@ -1,25 +1,107 @@
-from PyPDF2 import PdfMerger
+from PyPDF2 import PdfReader, PdfWriter
+from collections import OrderedDict
+from io import BytesIO
 import os
+import threading
 
-def anexar_documentacion(pdf_principal_path, productos, carpeta_base="documentos_productos"):
+from metricas import instrumentar
+
+# Manifiesto por carpeta base: {carpeta_base: (firma, {producto: [rutas_pdf]})}
+_manifiestos = {}
+# Páginas de los anexos ya interpretados: {ruta: ((mtime_ns, tamaño), (PageObject, ...))}.
+# Las páginas viven en un PdfWriter propio del anexo (objetos en memoria, sin stream que leer), así
+# varios hilos pueden copiarlas a la vez a su PdfWriter sin compartir un PdfReader.
+MAX_ANEXOS_EN_CACHE = 64
+_anexos = OrderedDict()
+_lock = threading.Lock()
+
+
+def _firma_carpeta(carpeta_base):
+    # mtime de la carpeta base y de cada subcarpeta: cambia al agregar/quitar productos o archivos
+    subcarpetas = []
+    with os.scandir(carpeta_base) as entradas:
+        for entrada in entradas:
+            if entrada.is_dir():
+                subcarpetas.append((entrada.name, entrada.stat().st_mtime_ns))
+    return os.stat(carpeta_base).st_mtime_ns, tuple(sorted(subcarpetas))
+
+
+def indice_documentos(carpeta_base="documentos_productos"):
+    """
+    Manifiesto {producto: [pdfs ordenados]} de `carpeta_base`. Se reconstruye sólo cuando cambia
+    el mtime de la carpeta o de alguna subcarpeta de producto.
+    """
+    if not os.path.isdir(carpeta_base):
+        return {}
+    firma = _firma_carpeta(carpeta_base)
+    with _lock:
+        guardado = _manifiestos.get(carpeta_base)
+    if guardado and guardado[0] == firma:
+        return guardado[1]
+
+    manifiesto = {}
+    with os.scandir(carpeta_base) as entradas:
+        for entrada in entradas:
+            if entrada.is_dir():
+                archivos_pdf = sorted(f for f in os.listdir(entrada.path) if f.lower().endswith(".pdf"))
+                manifiesto[entrada.name] = [os.path.join(entrada.path, f) for f in archivos_pdf]
+    with _lock:
+        _manifiestos[carpeta_base] = (firma, manifiesto)
+    return manifiesto
+
+
+def _anexo(ruta):
+    """Páginas del PDF `ruta`, interpretadas una sola vez mientras el archivo no cambie. Son de sólo lectura."""
+    info = os.stat(ruta)
+    firma = (info.st_mtime_ns, info.st_size)
+    with _lock:
+        guardado = _anexos.get(ruta)
+        if guardado and guardado[0] == firma:
+            _anexos.move_to_end(ruta)
+            return guardado[1]
+
+    # La lectura y el análisis van fuera del candado: las demás sesiones no esperan este archivo
+    with open(ruta, "rb") as f:
+        reader = PdfReader(BytesIO(f.read()))
+    propio = PdfWriter()
+    for pagina in reader.pages:
+        propio.add_page(pagina)
+    paginas = tuple(propio.pages)
+    with _lock:
+        _anexos[ruta] = (firma, paginas)
+        _anexos.move_to_end(ruta)
+        while len(_anexos) > MAX_ANEXOS_EN_CACHE:
+            _anexos.popitem(last=False)
+    return paginas
+
+
+@instrumentar("anexar_documentacion")
+def anexar_documentacion(pdf_principal_path, productos, carpeta_base="documentos_productos", salida=None):
     """
     Combina el PDF principal de la propuesta con los documentos asociados a cada producto.
     Para cada producto se espera una carpeta con su nombre dentro de `carpeta_base`,
-    que contenga uno o más PDFs que serán agregados al final.
+    que contenga uno o más PDFs que serán agregados al final. Cada documento se agrega
+    una sola vez aunque el producto aparezca en varias partidas.
+    `pdf_principal_path` puede ser una ruta o un archivo en memoria; `salida` también
+    (por omisión se escribe junto al principal con el sufijo _completo).
     """
-    merger = PdfMerger()
-    merger.append(pdf_principal_path)
+    manifiesto = indice_documentos(carpeta_base)
+    writer = PdfWriter()
+    writer.append(pdf_principal_path)
 
+    incluidos = set()
     for producto in productos:
         nombre = producto.get("producto") or producto.get("Producto")
-        ruta_carpeta = os.path.join(carpeta_base, nombre)
-        if os.path.isdir(ruta_carpeta):
-            archivos_pdf = sorted([f for f in os.listdir(ruta_carpeta) if f.lower().endswith(".pdf")])
-            for archivo in archivos_pdf:
-                path_completo = os.path.join(ruta_carpeta, archivo)
-                merger.append(path_completo)
-
-    salida = pdf_principal_path.replace(".pdf", "_completo.pdf")
-    merger.write(salida)
-    merger.close()
+        for path_completo in manifiesto.get(nombre, []):
+            if path_completo in incluidos:
+                continue
+            incluidos.add(path_completo)
+            # add_page copia la página y sus recursos a este writer; las páginas en caché no cambian
+            for pagina in _anexo(path_completo):
+                writer.add_page(pagina)
+
+    if salida is None:
+        salida = pdf_principal_path.replace(".pdf", "_completo.pdf")
+    writer.write(salida)
+    writer.close()
     return salida
@@ -1,23 +1,32 @@
 # empresas.py
+import sqlite3
+
 import streamlit as st
 import pandas as pd
-from database import conectar_db
+from database import conectar_db, expresion_fts
+from rfc import normalizar_rfc
+
+# Filas que muestran las listas de la interfaz; para encontrar algo más se usa la búsqueda
+LIMITE_LISTA = 200
 
 def agregar_empresa(datos):
+    """Registra una empresa; lanza sqlite3.IntegrityError si ya existe otra con el mismo RFC."""
     conn = conectar_db()
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO empresas (
-            razon_social, rfc, calle, numero_exterior, numero_interior,
-            codigo_postal, municipio, ciudad, estado, notas
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        datos["razon_social"], datos["rfc"], datos["calle"], datos["numero_exterior"],
-        datos["numero_interior"], datos["codigo_postal"], datos["municipio"],
-        datos["ciudad"], datos["estado"], datos["notas"]
-    ))
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute("""
+            INSERT INTO empresas (
+                razon_social, rfc, calle, numero_exterior, numero_interior,
+                codigo_postal, municipio, ciudad, estado, notas, rfc_normalizado
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            datos["razon_social"], datos["rfc"], datos["calle"], datos["numero_exterior"],
+            datos["numero_interior"], datos["codigo_postal"], datos["municipio"],
+            datos["ciudad"], datos["estado"], datos["notas"], normalizar_rfc(datos["rfc"])
+        ))
+        conn.commit()
+    finally:
+        conn.close()
 
 def mostrar_empresas():
     conn = conectar_db()
@@ -25,6 +34,50 @@ def mostrar_empresas():
     conn.close()
     return df
 
+def buscar_empresas(texto, limite=50):
+    """
+    Empresas que coinciden con `texto` en razón social, RFC, ciudad, municipio o estado, de la más
+    a la menos relevante (la razón social y el RFC pesan más). Sin texto, las primeras por razón social.
+    """
+    expresion = expresion_fts(texto)
+    conn = conectar_db()
+    if expresion:
+        df = pd.read_sql_query("""
+            SELECT e.* FROM empresas_fts
+            JOIN empresas e ON e.id = empresas_fts.rowid
+            WHERE empresas_fts MATCH ?
+            ORDER BY bm25(empresas_fts, 10.0, 5.0, 1.0, 1.0, 1.0)
+            LIMIT ?
+        """, conn, params=(expresion, limite))
+    else:
+        df = pd.read_sql_query(
+            "SELECT * FROM empresas ORDER BY razon_social COLLATE NOCASE LIMIT ?", conn, params=(limite,)
+        )
+    conn.close()
+    return df
+
+def empresas_por_prefijo(prefijo, limite=20):
+    """
+    Hasta `limite` empresas cuya razón social empieza con `prefijo` (sin distinguir mayúsculas),
+    en orden alfabético, como lista de (id, razon_social, rfc). Es un rango sobre
+    idx_empresas_razon_social, así que no recorre la tabla.
+    """
+    prefijo = (prefijo or "").strip()
+    conn = conectar_db()
+    if prefijo:
+        filas = conn.execute("""
+            SELECT id, razon_social, rfc FROM empresas
+            WHERE razon_social >= ? COLLATE NOCASE AND razon_social < ? COLLATE NOCASE
+            ORDER BY razon_social COLLATE NOCASE
+            LIMIT ?
+        """, (prefijo, prefijo + "\U0010ffff", limite)).fetchall()
+    else:
+        filas = conn.execute(
+            "SELECT id, razon_social, rfc FROM empresas ORDER BY razon_social COLLATE NOCASE LIMIT ?", (limite,)
+        ).fetchall()
+    conn.close()
+    return filas
+
 def vista_empresas():
     st.title("🏢 Gestión de Empresas")
 
@@ -55,9 +108,15 @@ def vista_empresas():
                     "estado": estado,
                     "notas": notas
                 }
-                agregar_empresa(datos)
-                st.success("✅ Empresa guardada exitosamente")
+                try:
+                    agregar_empresa(datos)
+                    st.success("✅ Empresa guardada exitosamente")
+                except sqlite3.IntegrityError:
+                    st.error(f"⚠️ Ya existe una empresa con el RFC {rfc}.")
 
     st.subheader("📋 Lista de Empresas")
-    df = mostrar_empresas()
+    busqueda = st.text_input("🔎 Buscar por razón social, RFC o ciudad", key="buscar_empresas")
+    df = buscar_empresas(busqueda, limite=LIMITE_LISTA)
+    if len(df) == LIMITE_LISTA:
+        st.caption(f"Se muestran las primeras {LIMITE_LISTA} empresas; usa la búsqueda para encontrar otras.")
     st.dataframe(df, use_container_width=True)
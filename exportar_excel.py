@@ -0,0 +1,143 @@
+# exportar_excel.py
+import argparse
+import sys
+import time
+
+import xlsxwriter
+
+from database import conectar_db, inicializar_db
+from cotizaciones import COLUMNAS_PARTIDA, condiciones_historial
+
+# Filas que se piden a SQLite en cada fetchmany
+TAMANO_BLOQUE = 5000
+# Límite de filas de una hoja de Excel, sin contar el encabezado
+MAX_FILAS_HOJA = 1_048_575
+COLUMNAS_MONEDA = {
+    "total_venta", "total_costo", "utilidad", "precio_unitario", "precio_total",
+}
+
+
+def _libro(destino):
+    # constant_memory escribe cada fila a disco en cuanto se completa: la memoria no crece con el archivo.
+    # Sin strings_to_urls se evita revisar con regex cada texto buscando ligas
+    libro = xlsxwriter.Workbook(destino, {"constant_memory": True, "strings_to_urls": False})
+    formatos = {
+        "encabezado": libro.add_format({"bold": True, "bg_color": "#D9E1F2"}),
+        "moneda": libro.add_format({"num_format": "$#,##0.00"}),
+    }
+    return libro, formatos
+
+
+def _nueva_hoja(libro, formatos, nombre, columnas):
+    hoja = libro.add_worksheet(nombre[:31])
+    for i, col in enumerate(columnas):
+        hoja.set_column(i, i, 14, formatos["moneda"] if col in COLUMNAS_MONEDA else None)
+    hoja.write_row(0, 0, columnas, formatos["encabezado"])
+    hoja.freeze_panes(1, 0)
+    return hoja
+
+
+def escribir_consulta(libro, formatos, nombre_hoja, cursor):
+    """
+    Vuelca el resultado de `cursor` en una o más hojas, pidiendo TAMANO_BLOQUE filas a la vez.
+    Si no cabe en una hoja continúa en "<nombre> (2)", "<nombre> (3)", ... Regresa las filas escritas.
+    """
+    columnas = [d[0] for d in cursor.description]
+    hoja = _nueva_hoja(libro, formatos, nombre_hoja, columnas)
+    fila = 0
+    hojas = 1
+    total = 0
+    while True:
+        filas = cursor.fetchmany(TAMANO_BLOQUE)
+        if not filas:
+            break
+        for valores in filas:
+            if fila == MAX_FILAS_HOJA:
+                hojas += 1
+                hoja = _nueva_hoja(libro, formatos, f"{nombre_hoja} ({hojas})", columnas)
+                fila = 0
+            fila += 1
+            hoja.write_row(fila, 0, valores)
+        total += len(filas)
+    return total
+
+
+def exportar_cotizacion_excel(cotizacion_id, destino):
+    """Una cotización en tres hojas: encabezado (campo/valor), partidas de venta y partidas de costo."""
+    libro, formatos = _libro(destino)
+    conn = conectar_db()
+    try:
+        cursor = conn.execute("SELECT * FROM cotizaciones WHERE id = ?", (int(cotizacion_id),))
+        fila = cursor.fetchone()
+        if fila is None:
+            raise IndexError(f"No existe la cotización {cotizacion_id}")
+        hoja = _nueva_hoja(libro, formatos, "Cotización", ["campo", "valor"])
+        for i, (campo, valor) in enumerate(zip((d[0] for d in cursor.description), fila), start=1):
+            hoja.write_row(i, 0, (campo, valor))
+
+        for tipo, nombre in (("venta", "Venta"), ("costo", "Costo")):
+            cursor = conn.execute(
+                f"SELECT {', '.join(COLUMNAS_PARTIDA)} FROM detalle_productos "
+                "WHERE cotizacion_id = ? AND tipo_origen = ? ORDER BY id",
+                (int(cotizacion_id), tipo),
+            )
+            escribir_consulta(libro, formatos, nombre, cursor)
+    finally:
+        conn.close()
+        libro.close()
+    return destino
+
+
+def exportar_historial_excel(destino, **filtros):
+    """
+    Historial filtrado (mismos filtros que ver_historial_paginado) en dos hojas: cotizaciones y
+    todas sus partidas. Las filas van de SQLite a disco por bloques, sin pasar por un DataFrame.
+    Regresa (cotizaciones, partidas).
+    """
+    condiciones, parametros = condiciones_historial(**filtros)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    libro, formatos = _libro(destino)
+    conn = conectar_db()
+    try:
+        cotizaciones = escribir_consulta(libro, formatos, "Cotizaciones", conn.execute(
+            f"SELECT * FROM cotizaciones {where} ORDER BY fecha DESC, id DESC", parametros
+        ))
+        columnas_partida = ", ".join(f"d.{col}" for col in COLUMNAS_PARTIDA)
+        # CROSS JOIN fija cotizaciones como tabla externa: se recorre en el orden de idx_cotizaciones_fecha
+        # y las partidas salen de idx_detalle_cotizacion ya ordenadas, sin un sort en memoria de todo el resultado
+        partidas = escribir_consulta(libro, formatos, "Partidas", conn.execute(f"""
+            SELECT c.id AS cotizacion_id, c.fecha, c.cliente, c.propuesta, d.tipo_origen, {columnas_partida}
+            FROM (SELECT id, fecha, cliente, propuesta FROM cotizaciones {where}) c
+            CROSS JOIN detalle_productos d ON d.cotizacion_id = c.id
+            ORDER BY c.fecha DESC, c.id DESC, d.tipo_origen, d.id
+        """, parametros))
+    finally:
+        conn.close()
+        libro.close()
+    return cotizaciones, partidas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta a Excel el historial de cotizaciones o una cotización.")
+    parser.add_argument("destino", help="Archivo .xlsx de salida")
+    parser.add_argument("--cotizacion", type=int, help="Exporta sólo esta cotización")
+    parser.add_argument("--desde", help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Fecha final (AAAA-MM-DD)")
+    parser.add_argument("--responsable", help="Responsable (coincidencia parcial)")
+    parser.add_argument("--cliente", help="Cliente (coincidencia parcial)")
+    args = parser.parse_args()
+
+    inicializar_db()
+    inicio = time.perf_counter()
+    if args.cotizacion is not None:
+        exportar_cotizacion_excel(args.cotizacion, args.destino)
+        print(f"✅ Cotización {args.cotizacion} exportada a {args.destino}", file=sys.stderr)
+    else:
+        cotizaciones, partidas = exportar_historial_excel(
+            args.destino, fecha_desde=args.desde, fecha_hasta=args.hasta,
+            responsable=args.responsable, cliente=args.cliente,
+        )
+        segundos = time.perf_counter() - inicio
+        print(f"✅ {cotizaciones:,} cotizaciones y {partidas:,} partidas en {args.destino} "
+              f"({segundos:.1f}s, {partidas / max(segundos, 1e-9):,.0f} partidas/s)", file=sys.stderr)
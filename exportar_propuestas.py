@@ -0,0 +1,99 @@
+# exportar_propuestas.py
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from database import inicializar_db
+from cotizaciones import ver_historial_paginado, obtener_detalle_cotizacion
+from pdf_utils import CotizacionPDFConLogo
+
+
+def ids_cotizaciones(tamano_pagina=1000, **filtros):
+    """Ids de las cotizaciones que cumplen los filtros de ver_historial_paginado, página por página."""
+    cursor = None
+    while True:
+        df, cursor = ver_historial_paginado(**filtros, despues_de=cursor, limite=tamano_pagina)
+        yield from (int(i) for i in df["id"])
+        if cursor is None:
+            break
+
+
+def renderizar_propuesta(cotizacion_id):
+    datos, venta, _ = obtener_detalle_cotizacion(cotizacion_id)
+    datos = datos.to_dict()
+    salida = BytesIO()
+    CotizacionPDFConLogo().generar_pdf_con_anexos(datos, venta.to_dict("records"), datos["total_venta"], salida=salida)
+    return cotizacion_id, f"cotizacion_cliente_{cotizacion_id}.pdf", salida.getvalue()
+
+
+def exportar_zip(destino, cotizacion_ids, procesos=None, progreso=None):
+    """
+    Genera la propuesta PDF (con anexos) de cada cotización en un pool de procesos y la escribe
+    en el ZIP `destino` (ruta o archivo) en cuanto está lista. Sólo hay unas cuantas propuestas
+    en memoria a la vez. `progreso(hechas, total)` se llama después de cada PDF.
+    Regresa la lista de (cotizacion_id, error) de las que no se pudieron generar.
+    """
+    cotizacion_ids = list(cotizacion_ids)
+    total = len(cotizacion_ids)
+    procesos = procesos or os.cpu_count() or 1
+    errores = []
+    hechas = 0
+
+    # "spawn" para no heredar hilos ni conexiones del proceso de Streamlit
+    contexto = multiprocessing.get_context("spawn")
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as zf, \
+            ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        pendientes = deque()
+
+        def escribir_siguiente():
+            nonlocal hechas
+            cotizacion_id, futuro = pendientes.popleft()
+            try:
+                _, nombre, pdf_bytes = futuro.result()
+                zf.writestr(nombre, pdf_bytes)
+            except Exception as e:
+                errores.append((cotizacion_id, str(e)))
+            hechas += 1
+            if progreso:
+                progreso(hechas, total)
+
+        for cotizacion_id in cotizacion_ids:
+            pendientes.append((cotizacion_id, pool.submit(renderizar_propuesta, cotizacion_id)))
+            if len(pendientes) >= procesos * 2:
+                escribir_siguiente()
+        while pendientes:
+            escribir_siguiente()
+    return errores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta a un ZIP las propuestas PDF de las cotizaciones filtradas.")
+    parser.add_argument("destino", help="Archivo .zip de salida")
+    parser.add_argument("--desde", help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Fecha final (AAAA-MM-DD)")
+    parser.add_argument("--responsable", help="Responsable (coincidencia parcial)")
+    parser.add_argument("--cliente", help="Cliente (coincidencia parcial)")
+    parser.add_argument("--procesos", type=int, default=None)
+    args = parser.parse_args()
+
+    inicializar_db()
+    ids = list(ids_cotizaciones(
+        fecha_desde=args.desde, fecha_hasta=args.hasta, responsable=args.responsable, cliente=args.cliente
+    ))
+    inicio = time.perf_counter()
+
+    def mostrar_progreso(hechas, total):
+        print(f"\r{hechas}/{total} propuestas", end="", file=sys.stderr, flush=True)
+
+    errores = exportar_zip(args.destino, ids, args.procesos, mostrar_progreso)
+    print(file=sys.stderr)
+    for cotizacion_id, error in errores:
+        print(f"⚠️ Cotización {cotizacion_id}: {error}", file=sys.stderr)
+    print(f"✅ {len(ids) - len(errores)} propuestas en {args.destino} "
+          f"({time.perf_counter() - inicio:.1f}s)", file=sys.stderr)
@@ -0,0 +1,223 @@
+# importar_crm.py
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from database import (
+    COLUMNAS_BUSQUEDA, conectar_db, inicializar_db, pausar_fts, reanudar_fts, borrar_fts, indexar_fts,
+)
+from rfc import PATRON_RFC, normalizar_rfc
+
+COLUMNAS_EMPRESA = [
+    "razon_social", "rfc", "calle", "numero_exterior", "numero_interior",
+    "codigo_postal", "municipio", "ciudad", "estado", "notas",
+]
+# Posición de cada columna buscable de empresas dentro de COLUMNAS_EMPRESA
+_POSICIONES_BUSQUEDA = [COLUMNAS_EMPRESA.index(c) for c in COLUMNAS_BUSQUEDA["empresas"]]
+COLUMNAS_CONTACTO = ["nombre", "apellido_paterno", "apellido_materno", "correo", "telefono", "empresa_rfc"]
+
+# Si la empresa ya existe (mismo RFC normalizado) se actualiza sólo con los campos que traen valor
+UPSERT_EMPRESA = f"""
+    INSERT INTO empresas ({", ".join(COLUMNAS_EMPRESA)}, rfc_normalizado)
+    VALUES ({", ".join("?" for _ in COLUMNAS_EMPRESA)}, ?)
+    ON CONFLICT (rfc_normalizado) WHERE rfc_normalizado IS NOT NULL DO UPDATE SET
+    {", ".join(f"{c} = COALESCE(NULLIF(excluded.{c}, ''), empresas.{c})" for c in COLUMNAS_EMPRESA)}
+"""
+INSERT_CONTACTO = """
+    INSERT INTO contactos (nombre, apellido_paterno, apellido_materno, correo, telefono, empresa_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def _nombre_columna(encabezado):
+    return str(encabezado or "").strip().lower().replace(" ", "_")
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        # Excel guarda códigos postales y teléfonos como números
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def leer_filas(ruta):
+    """Genera las filas de un CSV o XLSX como dicts {columna: texto}, sin cargar el archivo completo."""
+    if ruta.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            columnas = [_nombre_columna(c) for c in next(filas, ())]
+            for fila in filas:
+                if any(v is not None for v in fila):
+                    yield {col: _texto(v) for col, v in zip(columnas, fila)}
+        finally:
+            libro.close()
+    else:
+        with open(ruta, newline="", encoding="utf-8-sig") as f:
+            lector = csv.reader(f)
+            columnas = [_nombre_columna(c) for c in next(lector, [])]
+            for fila in lector:
+                if any(fila):
+                    yield dict(zip(columnas, map(str.strip, fila)))
+
+
+def en_bloques(filas, tamano_bloque):
+    bloque = []
+    for numero, fila in enumerate(filas, start=2):  # la fila 1 es el encabezado
+        bloque.append((numero, fila))
+        if len(bloque) >= tamano_bloque:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def _validar_empresa(fila):
+    if not fila.get("razon_social"):
+        return None, "sin razón social"
+    rfc = normalizar_rfc(fila.get("rfc"))
+    if fila.get("rfc") and rfc and not PATRON_RFC.match(rfc):
+        return None, f"RFC inválido: {fila['rfc']}"
+    return tuple(fila.get(c, "") for c in COLUMNAS_EMPRESA) + (rfc,), None
+
+
+def _importar_empresas(conn, bloque, rechazos):
+    valores = []
+    for numero, fila in bloque:
+        registro, motivo = _validar_empresa(fila)
+        if motivo:
+            rechazos.append((numero, motivo, fila))
+        else:
+            valores.append(registro)
+
+    # Columnas buscables actuales de las empresas del bloque que ya existen: {rfc: (id, [valores])}
+    rfcs = {v[-1] for v in valores if v[-1]}
+    existentes = {
+        rfc: (id_, list(campos)) for id_, rfc, *campos in conn.execute(f"""
+            SELECT id, rfc_normalizado, {", ".join(COLUMNAS_BUSQUEDA["empresas"])} FROM empresas
+            WHERE rfc_normalizado IN (SELECT value FROM json_each(?))
+        """, (json.dumps(list(rfcs)),))
+    }
+    # Se simula el upsert sobre esas columnas para reindexar sólo las empresas en las que cambian
+    finales = {rfc: list(campos) for rfc, (_, campos) in existentes.items()}
+    for registro in valores:
+        campos = finales.get(registro[-1])
+        if campos is not None:
+            for i, j in enumerate(_POSICIONES_BUSQUEDA):
+                campos[i] = registro[j] or campos[i]
+    cambiadas = json.dumps([id_ for rfc, (id_, campos) in existentes.items() if finales[rfc] != campos])
+
+    # El índice de búsqueda se actualiza una vez por bloque en lugar de fila por fila
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM empresas").fetchone()[0]
+    borrar_fts(conn, "empresas", "id IN (SELECT value FROM json_each(?))", (cambiadas,))
+    conn.executemany(UPSERT_EMPRESA, valores)
+    indexar_fts(conn, "empresas", "id IN (SELECT value FROM json_each(?))", (cambiadas,))
+    indexar_fts(conn, "empresas", "id > ?", (ultimo_id,))
+    # Filas sin RFC y RFC que no existían (contando una vez los repetidos dentro del bloque)
+    nuevas = sum(1 for v in valores if not v[-1]) + len(rfcs - existentes.keys())
+    return nuevas, len(valores) - nuevas
+
+
+def _importar_contactos(conn, bloque, rechazos):
+    rfcs = {normalizar_rfc(fila.get("empresa_rfc")) for _, fila in bloque} - {None}
+    empresa_por_rfc = dict(conn.execute(
+        "SELECT rfc_normalizado, id FROM empresas WHERE rfc_normalizado IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(rfcs)),),
+    ))
+    valores = []
+    for numero, fila in bloque:
+        empresa_id = empresa_por_rfc.get(normalizar_rfc(fila.get("empresa_rfc")))
+        if not fila.get("nombre"):
+            rechazos.append((numero, "sin nombre", fila))
+        elif fila.get("correo") and "@" not in fila["correo"]:
+            rechazos.append((numero, f"correo inválido: {fila['correo']}", fila))
+        elif empresa_id is None:
+            rechazos.append((numero, f"no existe una empresa con RFC {fila.get('empresa_rfc')!r}", fila))
+        else:
+            valores.append((fila.get("nombre"), fila.get("apellido_paterno", ""), fila.get("apellido_materno", ""),
+                            fila.get("correo", ""), fila.get("telefono", ""), empresa_id))
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM contactos").fetchone()[0]
+    conn.executemany(INSERT_CONTACTO, valores)
+    indexar_fts(conn, "contactos", "id > ?", (ultimo_id,))
+    return len(valores), 0
+
+
+def importar(tipo, ruta, tamano_bloque=20000, progreso=None):
+    """
+    Importa empresas o contactos desde un CSV/XLSX en transacciones de `tamano_bloque` filas.
+    Las empresas se deduplican por RFC normalizado (las existentes se actualizan); los contactos
+    se ligan a su empresa por la columna empresa_rfc.
+    Regresa un dict con leidas, insertadas, actualizadas, rechazos [(fila, motivo, datos)] y segundos.
+    """
+    importar_bloque = {"empresas": _importar_empresas, "contactos": _importar_contactos}[tipo]
+    resultado = {"leidas": 0, "insertadas": 0, "actualizadas": 0, "rechazos": []}
+    inicio = time.perf_counter()
+
+    conn = conectar_db()
+    try:
+        for bloque in en_bloques(leer_filas(ruta), tamano_bloque):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                pausar_fts(conn, tipo)
+                insertadas, actualizadas = importar_bloque(conn, bloque, resultado["rechazos"])
+                reanudar_fts(conn, tipo)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            resultado["leidas"] += len(bloque)
+            resultado["insertadas"] += insertadas
+            resultado["actualizadas"] += actualizadas
+            if progreso:
+                progreso(resultado["leidas"], time.perf_counter() - inicio)
+    finally:
+        conn.close()
+
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def escribir_rechazos(ruta, rechazos):
+    columnas = ["fila", "motivo"] + sorted({c for _, _, fila in rechazos for c in fila})
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(columnas)
+        for numero, motivo, fila in rechazos:
+            escritor.writerow([numero, motivo] + [fila.get(c, "") for c in columnas[2:]])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga masiva de empresas o contactos desde CSV o XLSX.")
+    parser.add_argument("tipo", choices=["empresas", "contactos"])
+    parser.add_argument("archivo", help="CSV o XLSX con encabezados; empresas: " + ", ".join(COLUMNAS_EMPRESA)
+                        + "; contactos: " + ", ".join(COLUMNAS_CONTACTO))
+    parser.add_argument("--bloque", type=int, default=20000, help="Filas por transacción")
+    parser.add_argument("--rechazos", help="CSV donde escribir las filas rechazadas y el motivo")
+    args = parser.parse_args()
+
+    inicializar_db()
+
+    def mostrar_progreso(leidas, segundos):
+        print(f"\r{leidas:,} filas — {leidas / max(segundos, 1e-9):,.0f} filas/s", end="", file=sys.stderr, flush=True)
+
+    resultado = importar(args.tipo, args.archivo, args.bloque, mostrar_progreso)
+    print(file=sys.stderr)
+    rechazos = resultado["rechazos"]
+    if rechazos and args.rechazos:
+        escribir_rechazos(args.rechazos, rechazos)
+    print(f"✅ {resultado['leidas']:,} filas en {resultado['segundos']:.2f}s "
+          f"({resultado['leidas'] / max(resultado['segundos'], 1e-9):,.0f} filas/s): "
+          f"{resultado['insertadas']:,} nuevas, {resultado['actualizadas']:,} actualizadas, "
+          f"{len(rechazos):,} rechazadas", file=sys.stderr)
+    for numero, motivo, _ in rechazos[:10]:
+        print(f"  fila {numero}: {motivo}", file=sys.stderr)
+    if len(rechazos) > 10 and not args.rechazos:
+        print(f"  ... usa --rechazos {os.path.splitext(args.archivo)[0]}_rechazos.csv para ver todas",
+              file=sys.stderr)
@@ -0,0 +1,227 @@
+# metricas.py
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Sesiones de Streamlit que han ejecutado la app en este proceso
+_sesiones = set()
+_sesiones_lock = threading.Lock()
+# RSS después de cargar el estado compartido; lo que crece encima se atribuye a las sesiones
+_rss_base = None
+
+# Tiempos de las rutas críticas; se activan con CRM_METRICAS=1 al iniciar el proceso.
+# Desactivadas, los decoradores regresan la función original y tramo() un contexto vacío.
+METRICAS_ACTIVAS = os.environ.get("CRM_METRICAS", "").lower() in ("1", "true", "si", "sí")
+# Límites superiores (segundos) de las cubetas del histograma de latencias
+CUBETAS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# {tramo: [conteos por cubeta (+ la de +Inf), llamadas, suma de segundos, máximo]}
+_tramos = {}
+_tramos_lock = threading.Lock()
+_NULO = nullcontext()
+
+
+def rss_proceso():
+    """Memoria residente (bytes) del proceso actual, o None si la plataforma no la expone."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    # Sin /proc sólo está el pico
+    return rss_pico()
+
+
+def rss_pico():
+    """Memoria residente máxima (bytes) que ha alcanzado el proceso, o None sin el módulo resource."""
+    if resource is None:
+        return None
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def marcar_rss_base():
+    """Toma la RSS actual como base compartida (llamar al terminar de cargar catálogo y base)."""
+    global _rss_base
+    _rss_base = rss_proceso()
+
+
+def registrar_sesion():
+    """Anota la sesión de Streamlit que está corriendo el script (llamar en cada rerun)."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        with _sesiones_lock:
+            _sesiones.add(ctx.session_id)
+
+
+def sesiones_activas():
+    """Número de sesiones registradas que siguen conectadas al servidor."""
+    from streamlit.runtime import Runtime
+
+    with _sesiones_lock:
+        if Runtime.exists():
+            runtime = Runtime.instance()
+            _sesiones.intersection_update({s for s in _sesiones if runtime.is_active_session(s)})
+        return len(_sesiones)
+
+
+def memoria_por_sesion():
+    """
+    (rss del proceso, sesiones activas, rss por sesión) en bytes. La RSS por sesión es el
+    crecimiento sobre la base compartida repartido entre las sesiones activas.
+    """
+    rss = rss_proceso()
+    sesiones = sesiones_activas()
+    if rss is None:
+        return None, sesiones, None
+    base = _rss_base if _rss_base is not None else rss
+    return rss, sesiones, max(rss - base, 0) / max(sesiones, 1)
+
+
+def registrar_tiempo(nombre, segundos):
+    with _tramos_lock:
+        datos = _tramos.get(nombre)
+        if datos is None:
+            datos = _tramos[nombre] = [[0] * (len(CUBETAS) + 1), 0, 0.0, 0.0]
+        datos[0][bisect.bisect_left(CUBETAS, segundos)] += 1
+        datos[1] += 1
+        datos[2] += segundos
+        if segundos > datos[3]:
+            datos[3] = segundos
+
+
+class _Tramo:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registrar_tiempo(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+def tramo(nombre):
+    """Contexto que mide el bloque como `nombre` (cuenta también las llamadas que terminan en excepción)."""
+    return _Tramo(nombre) if METRICAS_ACTIVAS else _NULO
+
+
+def instrumentar(nombre):
+    """Decorador que mide cada llamada como `nombre`; con las métricas desactivadas no envuelve la función."""
+    def decorador(funcion):
+        if not METRICAS_ACTIVAS:
+            return funcion
+
+        @functools.wraps(funcion)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                registrar_tiempo(nombre, time.perf_counter() - inicio)
+        return medida
+    return decorador
+
+
+def reiniciar_metricas():
+    with _tramos_lock:
+        _tramos.clear()
+
+
+def _percentil_histograma(conteos, llamadas, maximo, p):
+    # Límite superior de la cubeta donde cae el percentil, sin pasar del máximo observado
+    objetivo = llamadas * p
+    acumulado = 0
+    for limite, conteo in zip(CUBETAS, conteos):
+        acumulado += conteo
+        if acumulado >= objetivo:
+            return min(limite, maximo)
+    return maximo
+
+
+def resumen_metricas():
+    """Una fila por tramo: llamadas, tiempo total, promedio, p50/p95/p99 (por cubeta) y máximo, en ms."""
+    with _tramos_lock:
+        copia = {nombre: (list(c), n, suma, maximo) for nombre, (c, n, suma, maximo) in _tramos.items()}
+    filas = []
+    for nombre, (conteos, llamadas, suma, maximo) in sorted(copia.items(), key=lambda t: -t[1][2]):
+        fila = {"tramo": nombre, "llamadas": llamadas, "total_s": round(suma, 3),
+                "promedio_ms": round(suma / llamadas * 1000, 3)}
+        for etiqueta, p in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            fila[etiqueta] = round(_percentil_histograma(conteos, llamadas, maximo, p) * 1000, 3)
+        fila["maximo_ms"] = round(maximo * 1000, 3)
+        filas.append(fila)
+    return filas
+
+
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def exportar_prometheus():
+    """Histogramas de latencia y memoria del proceso en el formato de texto de Prometheus."""
+    with _tramos_lock:
+        copia = {nombre: (list(c), n, suma) for nombre, (c, n, suma, _) in _tramos.items()}
+    lineas = [
+        "# HELP cotizador_duracion_segundos Duración de las rutas críticas del cotizador.",
+        "# TYPE cotizador_duracion_segundos histogram",
+    ]
+    for nombre, (conteos, llamadas, suma) in sorted(copia.items()):
+        etiqueta = _etiqueta(nombre)
+        acumulado = 0
+        for limite, conteo in zip(CUBETAS, conteos):
+            acumulado += conteo
+            lineas.append(f'cotizador_duracion_segundos_bucket{{tramo="{etiqueta}",le="{limite}"}} {acumulado}')
+        lineas.append(f'cotizador_duracion_segundos_bucket{{tramo="{etiqueta}",le="+Inf"}} {llamadas}')
+        lineas.append(f'cotizador_duracion_segundos_sum{{tramo="{etiqueta}"}} {suma:.6f}')
+        lineas.append(f'cotizador_duracion_segundos_count{{tramo="{etiqueta}"}} {llamadas}')
+    rss = rss_proceso()
+    if rss is not None:
+        lineas += [
+            "# HELP cotizador_rss_bytes Memoria residente del proceso.",
+            "# TYPE cotizador_rss_bytes gauge",
+            f"cotizador_rss_bytes {rss}",
+        ]
+    return "\n".join(lineas) + "\n"
+
+
+def vista_metricas():
+    import pandas as pd
+    import streamlit as st
+    # auth importa database, que a su vez importa este módulo
+    from auth import acceso_admin
+
+    st.header("⏱️ Métricas de rendimiento")
+    if not acceso_admin(st):
+        return
+    if not METRICAS_ACTIVAS:
+        st.info("Las métricas están desactivadas. Inicia la app con la variable de entorno CRM_METRICAS=1.")
+        return
+
+    filas = resumen_metricas()
+    if filas:
+        st.dataframe(pd.DataFrame(filas), use_container_width=True, hide_index=True)
+        st.caption("p50/p95/p99 son el límite superior de la cubeta del histograma en que caen.")
+    else:
+        st.write("Todavía no hay mediciones en este proceso.")
+    col1, col2 = st.columns(2)
+    col1.download_button("📥 Descargar métricas (Prometheus)", exportar_prometheus(),
+                         file_name="metricas.prom", mime="text/plain")
+    if col2.button("🔄 Reiniciar métricas"):
+        reiniciar_metricas()
+        st.rerun()
@@ -0,0 +1,93 @@
+# motor_precios.py
+import numpy as np
+import pandas as pd
+
+COLUMNAS_COSTO = [
+    "Producto", "Cantidad", "Precio Base", "Item Disc. %",
+    "Channel + Deal Disc. %", "Precio Final Unitario", "Subtotal",
+]
+COLUMNAS_VENTA = [
+    "Producto", "Cantidad", "Precio Unitario de Lista", "Precio Total de Lista",
+    "Descuento %", "Precio Total con Descuento",
+]
+
+
+def redondear(valores, decimales=2):
+    # Los precios vienen del DataFrame como np.float64, así que round() siempre ha redondeado
+    # con np.round; se conserva ese comportamiento para que los importes no cambien.
+    return np.round(np.asarray(valores, dtype=np.float64), decimales)
+
+
+def calcular_costos(productos, cantidades, precios_base, item_disc, channel_disc, deal_reg_disc):
+    cantidades = np.asarray(cantidades)
+    precios_base = np.asarray(precios_base, dtype=np.float64)
+    item_disc = np.asarray(item_disc, dtype=np.float64)
+
+    precio1 = precios_base * (1 - item_disc / 100)
+    total_channel = np.asarray(channel_disc, dtype=np.float64) + np.asarray(deal_reg_disc, dtype=np.float64)
+    precio_final = precio1 * (1 - total_channel / 100)
+    subtotal = precio_final * cantidades
+
+    return pd.DataFrame({
+        "Producto": list(productos),
+        "Cantidad": cantidades,
+        "Precio Base": precios_base,
+        "Item Disc. %": item_disc,
+        "Channel + Deal Disc. %": total_channel,
+        "Precio Final Unitario": redondear(precio_final),
+        "Subtotal": redondear(subtotal),
+    }, columns=COLUMNAS_COSTO)
+
+
+def calcular_venta(productos, cantidades, precios_lista, descuento_directo):
+    cantidades = np.asarray(cantidades)
+    precios_lista = np.asarray(precios_lista, dtype=np.float64)
+    descuento_directo = np.asarray(descuento_directo, dtype=np.float64)
+
+    precio_total_lista = precios_lista * cantidades
+    precio_con_descuento = precio_total_lista * (1 - descuento_directo / 100)
+
+    return pd.DataFrame({
+        "Producto": list(productos),
+        "Cantidad": cantidades,
+        "Precio Unitario de Lista": redondear(precios_lista),
+        "Precio Total de Lista": redondear(precio_total_lista),
+        "Descuento %": descuento_directo,
+        "Precio Total con Descuento": redondear(precio_con_descuento),
+    }, columns=COLUMNAS_VENTA)
+
+
+def calcular_utilidad(costo_total, venta_total):
+    # El margen sólo tiene sentido con venta y costo positivos, igual que en la vista de cotización
+    if venta_total > 0 and costo_total > 0:
+        utilidad = venta_total - costo_total
+        return utilidad, (utilidad / venta_total) * 100
+    return None, None
+
+
+def cotizar(lineas):
+    """
+    Calcula en una sola pasada las tablas de costo y venta de todas las líneas.
+    `lineas` es un DataFrame (o dict de columnas) con producto, cantidad, precio_base,
+    item_disc, channel_disc, deal_reg_disc y descuento_directo.
+    """
+    lineas = pd.DataFrame(lineas)
+    costo = calcular_costos(
+        lineas["producto"], lineas["cantidad"].to_numpy(), lineas["precio_base"].to_numpy(),
+        lineas["item_disc"].to_numpy(), lineas["channel_disc"].to_numpy(), lineas["deal_reg_disc"].to_numpy(),
+    )
+    venta = calcular_venta(
+        lineas["producto"], lineas["cantidad"].to_numpy(), lineas["precio_base"].to_numpy(),
+        lineas["descuento_directo"].to_numpy(),
+    )
+    costo_total = costo["Subtotal"].sum()
+    venta_total = venta["Precio Total con Descuento"].sum()
+    utilidad, margen = calcular_utilidad(costo_total, venta_total)
+    return {
+        "costo": costo,
+        "venta": venta,
+        "costo_total": costo_total,
+        "venta_total": venta_total,
+        "utilidad": utilidad,
+        "margen": margen,
+    }
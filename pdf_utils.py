@@ -1,15 +1,139 @@
 # pdf_utils.py
 from fpdf import FPDF
 from documentos import anexar_documentacion
+from metricas import instrumentar
+from collections import OrderedDict
+from io import BytesIO
+import hashlib
+import json
 import os
+import tempfile
+import threading
+import time
+
+try:
+    from PIL import Image
+except ImportError:  # Sin Pillow el logo se usa a su resolución original
+    Image = None
+
+
+def pdf_a_bytes(pdf):
+    """Genera el documento en memoria, sin escribir archivos (fpdf 1.7 regresa str latin-1; fpdf2, bytearray)."""
+    salida = pdf.output(dest="S")
+    if isinstance(salida, str):
+        return salida.encode("latin-1")
+    return bytes(salida)
+
+
+def clave_pdf(*partes):
+    # Huella del contenido: mismo encabezado, partidas y condiciones => mismo PDF
+    contenido = json.dumps(partes, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CachePDF:
+    """
+    Caché de PDFs ya generados indexada por la huella de su contenido. Se limita por tamaño total
+    en bytes y descarta primero los menos usados.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes_usados = 0
+        self._pdfs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, generar):
+        with self._lock:
+            if clave in self._pdfs:
+                self._pdfs.move_to_end(clave)
+                return self._pdfs[clave]
+
+        pdf_bytes = generar()
+
+        with self._lock:
+            if clave not in self._pdfs and len(pdf_bytes) <= self.max_bytes:
+                self._pdfs[clave] = pdf_bytes
+                self.bytes_usados += len(pdf_bytes)
+                while self.bytes_usados > self.max_bytes:
+                    _, descartado = self._pdfs.popitem(last=False)
+                    self.bytes_usados -= len(descartado)
+        return pdf_bytes
+
+    def limpiar(self):
+        with self._lock:
+            self._pdfs.clear()
+            self.bytes_usados = 0
+
+
+# Caché compartida por todas las sesiones del proceso
+cache_pdfs = CachePDF()
+
+
+# ========================
+# Logos preprocesados
+# ========================
+# fpdf decodifica el PNG (y separa el canal alfa byte por byte) en cada documento nuevo.
+# Aquí se reduce el logo a resolución de impresión y se decodifica una sola vez por proceso;
+# cada documento recibe una copia superficial de esa información ya lista.
+DPI_IMPRESION = 300
+
+_logos = {}
+_logos_lock = threading.Lock()
+
+
+def _logo_a_resolucion_de_impresion(ruta, ancho_mm):
+    if Image is None:
+        return ruta
+    ancho_px = int(ancho_mm / 25.4 * DPI_IMPRESION)
+    with Image.open(ruta) as imagen:
+        if imagen.width <= ancho_px:
+            return ruta
+        alto_px = round(imagen.height * ancho_px / imagen.width)
+        reducida = imagen.resize((ancho_px, alto_px), Image.LANCZOS)
+    info = os.stat(ruta)
+    huella = hashlib.sha256(f"{os.path.abspath(ruta)}:{info.st_mtime_ns}:{info.st_size}".encode()).hexdigest()[:16]
+    destino = os.path.join(tempfile.gettempdir(), f"logo_{huella}_{ancho_px}px.png")
+    if not os.path.exists(destino):
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        reducida.save(temporal, format="PNG")
+        os.replace(temporal, destino)
+    return destino
+
+
+def _info_logo(pdf, ruta, ancho_mm):
+    info_archivo = os.stat(ruta)
+    clave = (os.path.abspath(ruta), info_archivo.st_mtime_ns, ancho_mm)
+    with _logos_lock:
+        info = _logos.get(clave)
+    if info is None:
+        info = pdf._parsepng(_logo_a_resolucion_de_impresion(ruta, ancho_mm))
+        with _logos_lock:
+            _logos[clave] = info
+    return info
+
+
+def imagen_logo(pdf, ruta, x, y, w):
+    """Dibuja el logo reutilizando la imagen ya procesada; equivale a pdf.image(ruta, x=x, y=y, w=w)."""
+    # Sólo fpdf 1.7 expone el diccionario `images`; con otras versiones se usa image() tal cual
+    if ruta.lower().endswith(".png") and isinstance(getattr(pdf, "images", None), dict) \
+            and hasattr(pdf, "_parsepng") and ruta not in pdf.images:
+        copia = dict(_info_logo(pdf, ruta, w))
+        copia["i"] = len(pdf.images) + 1
+        pdf.images[ruta] = copia
+    pdf.image(ruta, x=x, y=y, w=w)
+
 
 class CotizacionPDFConLogo(FPDF):
     def __init__(self, logo_path="logo_empresa.png"):
         super().__init__()
         self.logo_path = logo_path
 
+    def dibujar_logo(self):
+        imagen_logo(self, self.logo_path, x=10, y=8, w=50)
+
     def header(self):
-        self.image(self.logo_path, x=10, y=8, w=50)
+        self.dibujar_logo()
         self.set_font("Helvetica", "B", 16)
         self.set_xy(70, 12)
         self.cell(0, 10, "Cotización de Servicios", ln=True, align="L")
@@ -64,7 +188,21 @@ class CotizacionPDFConLogo(FPDF):
         self.cell(0, 8, responsable, ln=True)
         self.cell(0, 8, "SYNAPPSSYS", ln=True)
 
-    def generar_pdf_con_anexos(self, datos, productos, total_venta):
+    @instrumentar("generar_pdf")
+    def generar_pdf_bytes(self, datos, productos, total_venta):
+        self.add_page()
+        self.encabezado_cliente(datos)
+        self.tabla_productos(productos)
+        self.totales(total_venta)
+        self.condiciones(datos["vigencia"], datos["condiciones_comerciales"])
+        self.firma(datos["responsable"])
+        return pdf_a_bytes(self)
+
+    def generar_pdf_con_anexos(self, datos, productos, total_venta, salida=None):
+        # Con `salida` (ruta o archivo en memoria) no se escriben archivos intermedios
+        if salida is not None:
+            principal = BytesIO(self.generar_pdf_bytes(datos, productos, total_venta))
+            return anexar_documentacion(principal, productos, salida=salida)
         archivo_base = f"cotizacion_cliente_{datos['id']}.pdf"
         self.add_page()
         self.encabezado_cliente(datos)
@@ -74,3 +212,37 @@ class CotizacionPDFConLogo(FPDF):
         self.firma(datos["responsable"])
         self.output(archivo_base)
         return anexar_documentacion(archivo_base, productos)
+
+
+def medir_render_pdf(repeticiones=20, paginas=1):
+    """Tiempo promedio por PDF (en ms) con el logo decodificado en cada documento vs. en caché."""
+    datos = {
+        "id": 0, "cliente": "Cliente de prueba", "contacto": "Contacto", "propuesta": "Propuesta",
+        "fecha": "2025-01-01", "responsable": "Responsable", "vigencia": "30 días",
+        "condiciones_comerciales": "Precios en USD. No incluye impuestos.",
+    }
+    productos = [
+        {"producto": f"Producto {i}", "cantidad": 10, "precio_unitario": 100.0,
+         "precio_total": 900.0, "descuento_aplicado": 10.0}
+        for i in range(15 * paginas)
+    ]
+
+    class SinCacheDeLogo(CotizacionPDFConLogo):
+        def dibujar_logo(self):
+            self.image(self.logo_path, x=10, y=8, w=50)
+
+    resultados = {}
+    for nombre, clase in [("antes", SinCacheDeLogo), ("despues", CotizacionPDFConLogo)]:
+        clase().generar_pdf_bytes(datos, productos, 0)  # calentamiento (llena la caché del logo)
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            clase().generar_pdf_bytes(datos, productos, 0)
+        resultados[nombre] = (time.perf_counter() - inicio) / repeticiones * 1000
+    return resultados
+
+
+if __name__ == "__main__":
+    for paginas in (1, 3):
+        r = medir_render_pdf(paginas=paginas)
+        print(f"{paginas} página(s): antes {r['antes']:.1f} ms/PDF, después {r['despues']:.1f} ms/PDF "
+              f"({r['antes'] / r['despues']:.1f}x)")
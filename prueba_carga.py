@@ -0,0 +1,207 @@
+# prueba_carga.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import urlencode, urlsplit
+
+# Proporción de cada tipo de petición en la mezcla
+MEZCLA = {"precio": 50, "cotizar": 30, "detalle": 15, "guardar": 5}
+
+
+class Cliente:
+    """Conexión HTTP/1.1 keep-alive mínima (sin dependencias) para hablar con api.py."""
+
+    def __init__(self, host, puerto, token=None):
+        self.host = host
+        self.puerto = puerto
+        self.token = token
+        self.reader = self.writer = None
+
+    async def _conectar(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.puerto)
+
+    async def pedir(self, metodo, ruta, datos=None):
+        """Regresa (estado, contenido JSON o texto); reconecta una vez si el servidor cerró la conexión."""
+        cuerpo = json.dumps(datos).encode("utf-8") if datos is not None else b""
+        encabezado = f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(cuerpo)}\r\n"
+        if self.token:
+            encabezado += f"Authorization: Bearer {self.token}\r\n"
+        if datos is not None:
+            encabezado += "Content-Type: application/json\r\n"
+        mensaje = (encabezado + "\r\n").encode("latin-1") + cuerpo
+        for intento in range(2):
+            try:
+                if self.writer is None:
+                    await self._conectar()
+                self.writer.write(mensaje)
+                await self.writer.drain()
+                return await self._leer_respuesta()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.cerrar()
+                if intento:
+                    raise
+
+    async def _leer_respuesta(self):
+        bloque = await self.reader.readuntil(b"\r\n\r\n")
+        linea, *lineas = bloque.decode("latin-1").rstrip("\r\n").split("\r\n")
+        encabezados = {}
+        for renglon in lineas:
+            nombre, _, valor = renglon.partition(":")
+            encabezados[nombre.strip().lower()] = valor.strip()
+        cuerpo = await self.reader.readexactly(int(encabezados.get("content-length", 0)))
+        if encabezados.get("connection", "").lower() == "close":
+            self.cerrar()
+        if encabezados.get("content-type", "").startswith("application/json"):
+            cuerpo = json.loads(cuerpo)
+        else:
+            cuerpo = cuerpo.decode("utf-8")
+        return int(linea.split(" ")[1]), cuerpo
+
+    def cerrar(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)] if ordenados else None
+
+
+async def prueba_carga(url, concurrencia=50, segundos=10.0, mezcla=MEZCLA, semilla=0, token=None, ids=None):
+    """
+    Abre `concurrencia` conexiones keep-alive que mandan peticiones seguidas durante `segundos`,
+    eligiendo cada una al azar según `mezcla`. Regresa un dict con peticiones/s, p50/p99 por
+    tipo de petición y errores.
+
+    Las peticiones de "detalle" consultan las cotizaciones `ids`; sin ellas se guarda una al empezar,
+    salvo que la mezcla no tenga "guardar" (prueba sin escritura): entonces no se piden detalles.
+    """
+    destino = urlsplit(url)
+    host, puerto = destino.hostname or "127.0.0.1", destino.port or 80
+    rng = random.Random(semilla)
+
+    preparacion = Cliente(host, puerto, token)
+    estado, catalogo = await preparacion.pedir("GET", "/catalogo")
+    if estado != 200:
+        raise RuntimeError(f"GET /catalogo respondió {estado}: {catalogo}")
+    productos = {int(t): p for t, p in catalogo["productos"].items() if p}
+
+    def canasta():
+        termino = rng.choice(list(productos))
+        return {
+            "termino": termino,
+            "lineas": [
+                {"producto": rng.choice(productos[termino]), "cantidad": rng.randint(1, 100),
+                 "item_disc": rng.choice((0, 5, 10)), "channel_disc": rng.choice((0, 5)),
+                 "descuento_directo": rng.choice((0, 10, 15))}
+                for _ in range(rng.randint(1, 8))
+            ],
+        }
+
+    def cotizacion():
+        return {**canasta(), "cliente": f"Carga {rng.randint(1, 500)}", "propuesta": "Prueba de carga",
+                "responsable": "prueba_carga.py", "vigencia": "30 días"}
+
+    ids = list(ids or [])
+    if not ids and "guardar" not in mezcla:
+        mezcla = {t: p for t, p in mezcla.items() if t != "detalle"}
+    elif not ids and "detalle" in mezcla:
+        # Al menos una cotización guardada para poder consultar detalles (la canasta al azar puede no tener precios)
+        for _ in range(20):
+            estado, guardada = await preparacion.pedir("POST", "/cotizaciones", cotizacion())
+            if estado != 400:
+                break
+        if estado != 201:
+            raise RuntimeError(f"POST /cotizaciones respondió {estado}: {guardada}")
+        ids.append(guardada["id"])
+    preparacion.cerrar()
+
+    tipos = list(mezcla)
+    pesos = [mezcla[t] for t in tipos]
+    latencias = {t: [] for t in tipos}
+    errores = {}
+    fin = time.perf_counter() + segundos
+
+    async def usuario():
+        cliente = Cliente(host, puerto, token)
+        try:
+            while time.perf_counter() < fin:
+                tipo = rng.choices(tipos, pesos)[0]
+                if tipo == "precio":
+                    datos = canasta()
+                    linea = datos["lineas"][0]
+                    peticion = ("GET", "/precio?" + urlencode(
+                        {"termino": datos["termino"], "producto": linea["producto"], "cantidad": linea["cantidad"]}
+                    ), None)
+                elif tipo == "cotizar":
+                    peticion = ("POST", "/cotizar", canasta())
+                elif tipo == "guardar":
+                    peticion = ("POST", "/cotizaciones", cotizacion())
+                else:
+                    peticion = ("GET", f"/cotizaciones/{rng.choice(ids)}", None)
+                inicio = time.perf_counter()
+                try:
+                    estado, contenido = await cliente.pedir(*peticion)
+                except (OSError, asyncio.IncompleteReadError) as e:
+                    estado, contenido = type(e).__name__, None
+                latencias[tipo].append(time.perf_counter() - inicio)
+                # Un precio fuera de los tiers (404) o una canasta sin ningún precio (400 al guardar) son respuestas válidas
+                if estado not in (200, 201) and (tipo, estado) not in (("precio", 404), ("guardar", 400)):
+                    errores[f"{tipo} {estado}"] = errores.get(f"{tipo} {estado}", 0) + 1
+                elif tipo == "guardar" and estado == 201:
+                    ids.append(contenido["id"])
+        finally:
+            cliente.cerrar()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+
+    total = sum(len(v) for v in latencias.values())
+    resultado = {
+        "url": url, "concurrencia": concurrencia, "segundos": round(duracion, 2),
+        "peticiones": total, "peticiones_s": round(total / duracion, 1),
+        "errores": errores, "por_tipo": {},
+    }
+    for tipo, tiempos in latencias.items():
+        tiempos.sort()
+        if tiempos:
+            resultado["por_tipo"][tipo] = {
+                "peticiones": len(tiempos),
+                "p50_ms": round(_percentil(tiempos, 0.50) * 1000, 2),
+                "p99_ms": round(_percentil(tiempos, 0.99) * 1000, 2),
+                "maximo_ms": round(tiempos[-1] * 1000, 2),
+            }
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de api.py con conexiones keep-alive concurrentes.")
+    parser.add_argument("--url", default="http://127.0.0.1:8502")
+    parser.add_argument("--concurrencia", type=int, default=50, help="Conexiones simultáneas")
+    parser.add_argument("--segundos", type=float, default=10.0)
+    parser.add_argument("--sin-escritura", action="store_true",
+                        help="No guarda cotizaciones; sin --id tampoco se consultan detalles")
+    parser.add_argument("--id", type=int, action="append", dest="ids",
+                        help="Cotización existente para las consultas de detalle (se puede repetir)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="Archivo .json con el resultado")
+    args = parser.parse_args()
+
+    mezcla = {t: p for t, p in MEZCLA.items() if not (args.sin_escritura and t == "guardar")}
+    resultado = asyncio.run(prueba_carga(args.url, args.concurrencia, args.segundos, mezcla, args.semilla,
+                                         os.environ.get("CRM_API_TOKEN"), args.ids))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"✅ {resultado['peticiones']:,} peticiones en {resultado['segundos']}s — "
+          f"{resultado['peticiones_s']:,.0f} peticiones/s con {args.concurrencia} conexiones", file=sys.stderr)
+    for tipo, datos in resultado["por_tipo"].items():
+        print(f"  {tipo:<8} {datos['peticiones']:>7,}  p50 {datos['p50_ms']:>8.2f} ms  p99 {datos['p99_ms']:>8.2f} ms",
+              file=sys.stderr)
+    for error, veces in resultado["errores"].items():
+        print(f"  ❌ {error}: {veces:,}", file=sys.stderr)
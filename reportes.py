@@ -0,0 +1,140 @@
+# reportes.py
+import argparse
+
+import streamlit as st
+import pandas as pd
+from auth import acceso_admin
+from database import conectar_db, inicializar_db, SQL_AGREGAR_RESUMEN, SQL_RECONSTRUIR_RESUMEN
+
+# Dimensiones por las que se puede agrupar el resumen y su columna en resumen_ventas
+DIMENSIONES = {
+    "usuario": "r.usuario_id",
+    "cliente": "r.cliente",
+    "mes": "r.mes",
+}
+
+def resumen_ventas(agrupar_por=("usuario",), mes_desde=None, mes_hasta=None):
+    """
+    Totales de venta, costo, utilidad y margen agrupados por usuario, cliente y/o mes.
+    Se leen de resumen_ventas, así que el costo depende del número de grupos y no de cotizaciones.
+    """
+    columnas = [DIMENSIONES[d] for d in agrupar_por]
+    select = ", ".join(f"{col} AS {d}" for d, col in zip(agrupar_por, columnas))
+    if "usuario" in agrupar_por:
+        select += ", u.nombre AS usuario_nombre"
+        columnas.append("u.nombre")
+
+    condiciones = []
+    parametros = []
+    if mes_desde:
+        condiciones.append("r.mes >= ?")
+        parametros.append(mes_desde)
+    if mes_hasta:
+        condiciones.append("r.mes <= ?")
+        parametros.append(mes_hasta)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    group_by = f"GROUP BY {', '.join(columnas)}" if columnas else ""
+    order_by = f"ORDER BY {', '.join(columnas)}" if columnas else ""
+
+    query = f"""
+        SELECT {select + ',' if select else ''}
+               SUM(r.cotizaciones) AS cotizaciones,
+               SUM(r.total_venta) AS total_venta,
+               SUM(r.total_costo) AS total_costo,
+               SUM(r.utilidad) AS utilidad,
+               100.0 * SUM(r.utilidad) / NULLIF(SUM(r.total_venta), 0) AS margen
+        FROM resumen_ventas r
+        LEFT JOIN usuarios u ON u.id = r.usuario_id
+        {where}
+        {group_by}
+        {order_by}
+    """
+    conn = conectar_db()
+    df = pd.read_sql_query(query, conn, params=parametros)
+    conn.close()
+    return df
+
+def verificar_resumen_ventas(tolerancia=0.005):
+    """Compara resumen_ventas contra un recálculo desde cotizaciones; regresa los grupos que no cuadran."""
+    conn = conectar_db()
+    df = pd.read_sql_query(f"""
+        WITH esperado (usuario_id, cliente, mes, cotizaciones, total_venta, total_costo, utilidad) AS (
+            {SQL_AGREGAR_RESUMEN}
+        ),
+        comparado AS (
+            SELECT e.usuario_id, e.cliente, e.mes,
+                   e.cotizaciones AS esperado_cotizaciones, r.cotizaciones AS resumen_cotizaciones,
+                   e.total_venta AS esperado_venta, r.total_venta AS resumen_venta,
+                   e.total_costo AS esperado_costo, r.total_costo AS resumen_costo,
+                   e.utilidad AS esperado_utilidad, r.utilidad AS resumen_utilidad
+            FROM esperado e
+            LEFT JOIN resumen_ventas r USING (usuario_id, cliente, mes)
+            UNION ALL
+            SELECT r.usuario_id, r.cliente, r.mes, NULL, r.cotizaciones, NULL, r.total_venta,
+                   NULL, r.total_costo, NULL, r.utilidad
+            FROM resumen_ventas r
+            WHERE NOT EXISTS (
+                SELECT 1 FROM esperado e
+                WHERE (e.usuario_id, e.cliente, e.mes) = (r.usuario_id, r.cliente, r.mes)
+            )
+        )
+        SELECT * FROM comparado
+        WHERE resumen_cotizaciones IS NULL OR esperado_cotizaciones IS NULL
+           OR esperado_cotizaciones <> resumen_cotizaciones
+           OR ABS(esperado_venta - resumen_venta) > :tolerancia
+           OR ABS(esperado_costo - resumen_costo) > :tolerancia
+           OR ABS(esperado_utilidad - resumen_utilidad) > :tolerancia
+    """, conn, params={"tolerancia": tolerancia})
+    conn.close()
+    return df
+
+def reconstruir_resumen_ventas():
+    conn = conectar_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM resumen_ventas")
+        conn.execute(SQL_RECONSTRUIR_RESUMEN)
+        grupos = conn.execute("SELECT COUNT(*) FROM resumen_ventas").fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return grupos
+
+def vista_resumen_ventas():
+    st.title("📊 Resumen de ventas")
+    # Totales de venta, costo y margen de todo el equipo: sólo para administradores
+    if not acceso_admin(st):
+        return
+
+    agrupar_por = st.multiselect(
+        "Agrupar por", list(DIMENSIONES), default=["usuario"],
+        format_func={"usuario": "Usuario", "cliente": "Cliente", "mes": "Mes"}.get,
+    )
+    col1, col2 = st.columns(2)
+    mes_desde = col1.text_input("Desde el mes (AAAA-MM)")
+    mes_hasta = col2.text_input("Hasta el mes (AAAA-MM)")
+
+    df = resumen_ventas(agrupar_por, mes_desde or None, mes_hasta or None)
+    st.dataframe(df, use_container_width=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento de la tabla resumen_ventas.")
+    parser.add_argument("accion", choices=["verificar", "reconstruir"])
+    args = parser.parse_args()
+
+    inicializar_db()
+    if args.accion == "reconstruir":
+        grupos = reconstruir_resumen_ventas()
+        print(f"✅ resumen_ventas reconstruido: {grupos} grupos")
+    else:
+        diferencias = verificar_resumen_ventas()
+        if diferencias.empty:
+            print("✅ resumen_ventas cuadra con cotizaciones")
+        else:
+            print(diferencias.to_string(index=False))
+            print(f"⚠️ {len(diferencias)} grupos no cuadran; ejecuta `python reportes.py reconstruir`")
+            raise SystemExit(1)
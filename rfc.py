@@ -0,0 +1,22 @@
+# rfc.py
+# Reglas del RFC sin dependencias de la interfaz: las usan la capa de datos (migraciones),
+# los módulos de Streamlit y las herramientas de línea de comandos.
+import re
+
+# RFC de persona moral (3 letras) o física (4), fecha AAMMDD y homoclave
+PATRON_RFC = re.compile(r"^[A-ZÑ&]{3,4}\d{6}[A-Z0-9]{3}$")
+# RFC genéricos del SAT (público en general / extranjeros): los comparten muchas empresas
+RFC_GENERICOS = {"XAXX010101000", "XEXX010101000"}
+
+
+def normalizar_rfc(rfc):
+    """
+    RFC en mayúsculas y sin espacios, guiones ni puntos; None si viene vacío o es un RFC genérico.
+    Es la llave con la que se evitan empresas duplicadas (columna rfc_normalizado).
+    """
+    if rfc is None:
+        return None
+    normalizado = re.sub(r"[^A-Z0-9Ñ&]", "", str(rfc).upper())
+    if not normalizado or normalizado in RFC_GENERICOS:
+        return None
+    return normalizado